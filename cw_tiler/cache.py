@@ -0,0 +1,461 @@
+"""cw_tiler.cache: caches for reusing open raster objects across tiles."""
+
+from collections import OrderedDict
+import itertools
+import threading
+import weakref
+import numpy as np
+import rasterio
+from rasterio import windows
+from rasterio.vrt import WarpedVRT
+from rasterio.enums import Resampling
+
+
+class _ThreadToken(object):
+    __slots__ = ('id', '__weakref__')
+
+    def __init__(self, thread_id):
+        self.id = thread_id
+
+
+class _ThreadTracker(object):
+    """Ids for the calling threads, and which of them have exited.
+
+    :py:func:`threading.enumerate` only lists threads started through
+    :mod:`threading`. Each thread instead gets a token in a
+    :py:class:`threading.local`, which is cleared when any thread exits,
+    and a finalizer on the token records the exit. Ids are never reused,
+    unlike :py:func:`threading.get_ident` values.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._ids = itertools.count()
+        self._exited = set()
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Id of the calling thread."""
+        token = getattr(self._local, 'token', None)
+        if token is None:
+            token = _ThreadToken(next(self._ids))
+            # a weak reference, so that the finalizer does not keep the
+            # tracker alive for as long as the thread runs
+            weakref.finalize(token, _thread_exited, weakref.ref(self),
+                             token.id)
+            self._local.token = token
+        return token.id
+
+    def pop_exited(self):
+        """Ids of the threads that have exited since the last call."""
+        with self._lock:
+            exited, self._exited = self._exited, set()
+        return exited
+
+
+def _thread_exited(tracker_ref, thread_id):
+    tracker = tracker_ref()
+    if tracker is not None:
+        with tracker._lock:
+            tracker._exited.add(thread_id)
+
+
+class VRTCache(object):
+    """Bounded LRU cache of open :py:class:`rasterio.vrt.WarpedVRT` objects.
+
+    Building a :py:class:`rasterio.vrt.WarpedVRT` means setting up GDAL warp
+    options for the source, which is repeated needlessly when many chips are
+    cut from the same dataset. This cache keeps VRTs open, keyed by
+    ``(dataset identity, dst_crs, nodata, resampling)`` and calling thread,
+    and closes the least recently used one when full.
+
+    A VRT must not be read from two threads at once, so each thread gets
+    its own VRTs: up to `maxsize` per thread. As in :class:`DatasetPool`, a
+    thread's VRTs are only closed by its own lookups or once the thread has
+    exited, so one thread never closes a VRT that another is reading. Exits
+    are detected for any Python thread, including those not started
+    through :mod:`threading`.
+
+    The cache holds a reference to each source dataset so that its identity
+    cannot be reused while an entry is live. Each VRT also references its
+    source, so the reference cannot be a weak one. The cache never closes
+    source datasets; entries whose source has been closed are dropped on the
+    next lookup. Until then, or until :meth:`evict` is called for it, a
+    source stays alive even if the caller drops all references to it.
+    Callers that open many datasets without closing them should therefore
+    call ``evict(src)`` when done with each one.
+
+    Arguments
+    ---------
+    maxsize : int, optional
+        Maximum number of VRTs to keep open per thread. Defaults to ``16``.
+
+    """
+
+    def __init__(self, maxsize=16):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1.')
+        self.maxsize = maxsize
+        self._vrts = OrderedDict()
+        self._threads = _ThreadTracker()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._vrts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _key(self, src, crs, nodata, resampling):
+        return (self._threads.current(), id(src), str(crs), nodata,
+                Resampling(resampling))
+
+    def get(self, src, crs, nodata=None, resampling=Resampling.bilinear):
+        """Get an open VRT of `src` in `crs`, building it if not cached.
+
+        Arguments
+        ---------
+        src : :py:class:`rasterio.io.DatasetReader`
+            Open source dataset to warp.
+        crs : str or :py:class:`rasterio.crs.CRS`
+            Destination coordinate reference system for the VRT.
+        nodata : int or float, optional
+            Value used as both source and destination nodata in the VRT.
+            Defaults to ``None`` (use all data in warping).
+        resampling : :py:class:`rasterio.enums.Resampling`, optional
+            Resampling method for the VRT. Defaults to
+            ``rasterio.enums.Resampling.bilinear``.
+
+        Returns
+        -------
+        vrt : :py:class:`rasterio.vrt.WarpedVRT`
+            An open VRT owned by the cache for the calling thread. Do not
+            close it or pass it to other threads; use :meth:`evict` or
+            :meth:`close` instead.
+
+        """
+        key = self._key(src, crs, nodata, resampling)
+        with self._lock:
+            self._drop_closed()
+            if key in self._vrts:
+                self._vrts.move_to_end(key)
+                return self._vrts[key][1]
+            vrt = WarpedVRT(src, crs=crs, resampling=resampling,
+                            src_nodata=nodata, dst_nodata=nodata)
+            self._vrts[key] = (src, vrt)
+            exited = self._threads.pop_exited()
+            keys = [k for k in self._vrts if k[0] in exited]
+            own = [k for k in self._vrts if k[0] == key[0]]
+            keys.extend(own[:len(own) - self.maxsize])
+            for old_key in keys:
+                self._vrts.pop(old_key)[1].close()
+            return vrt
+
+    def evict(self, src=None):
+        """Close and remove cached VRTs.
+
+        Arguments
+        ---------
+        src : :py:class:`rasterio.io.DatasetReader`, optional
+            Only evict VRTs built on this dataset. By default, evicts all.
+
+        Returns
+        -------
+        int
+            The number of VRTs closed.
+
+        """
+        with self._lock:
+            keys = [key for key, (entry_src, _) in self._vrts.items()
+                    if src is None or entry_src is src]
+            for key in keys:
+                self._vrts.pop(key)[1].close()
+        return len(keys)
+
+    def close(self):
+        """Close all cached VRTs and empty the cache."""
+        self.evict()
+
+    def _drop_closed(self):
+        closed = [key for key, (entry_src, _) in self._vrts.items()
+                  if entry_src.closed]
+        for key in closed:
+            self._vrts.pop(key)[1].close()
+
+
+class DatasetPool(object):
+    """Bounded, thread-safe LRU pool of open datasets keyed by path.
+
+    Functions that accept a file path would otherwise call
+    :py:func:`rasterio.open` on every call, re-parsing the file header and
+    never closing the handle. The pool keeps datasets open, keyed by path,
+    open options and calling thread, and closes the least recently used one
+    when full.
+
+    A single :py:class:`rasterio.io.DatasetReader` must not be read from two
+    threads at once, so each thread gets its own handles: up to `maxsize`
+    per thread. A thread's handles are only closed by its own lookups, when
+    it has more than `maxsize` open, or once the thread has exited (for
+    any Python thread, including those not started through
+    :mod:`threading`). A dataset may therefore be closed while still in use
+    only if the same thread opens `maxsize` other datasets in the meantime;
+    hold a handle of your own, e.g. a :class:`cw_tiler.utils.SourceInfo` ,
+    for datasets that must stay open.
+
+    Arguments
+    ---------
+    maxsize : int, optional
+        Maximum number of datasets to keep open per thread. Defaults to
+        ``32``.
+
+    Attributes
+    ----------
+    opens : int
+        Number of times a dataset has been opened by the pool.
+    closes : int
+        Number of times the pool has closed a dataset.
+    hits : int
+        Number of lookups served by an already-open dataset.
+
+    """
+
+    def __init__(self, maxsize=32):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1.')
+        self.maxsize = maxsize
+        self.opens = 0
+        self.closes = 0
+        self.hits = 0
+        self._datasets = OrderedDict()
+        self._threads = _ThreadTracker()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, path, **options):
+        """Get an open dataset for `path`, opening it if not pooled.
+
+        Arguments
+        ---------
+        path : str
+            Path or URL of the dataset.
+        **options
+            Keyword arguments for :py:func:`rasterio.open`. Datasets opened
+            with different options are pooled separately.
+
+        Returns
+        -------
+        src : :py:class:`rasterio.io.DatasetReader`
+            An open dataset owned by the pool for the calling thread. Do not
+            close it or pass it to other threads; use :meth:`evict` or
+            :meth:`close` instead.
+
+        """
+        thread = self._threads.current()
+        key = (thread, path, tuple(sorted(options.items())))
+        with self._lock:
+            src = self._datasets.get(key)
+            if src is not None and not src.closed:
+                self._datasets.move_to_end(key)
+                self.hits += 1
+                return src
+            src = rasterio.open(path, **options)
+            self.opens += 1
+            self._datasets[key] = src
+            self._drop_exited_threads()
+            keys = [k for k in self._datasets if k[0] == thread]
+            for old_key in keys[:len(keys) - self.maxsize]:
+                self._close(self._datasets.pop(old_key))
+            return src
+
+    def evict(self, path=None):
+        """Close and remove pooled datasets.
+
+        Arguments
+        ---------
+        path : str, optional
+            Only evict datasets opened from this path. By default, evicts
+            all.
+
+        Returns
+        -------
+        int
+            The number of datasets removed.
+
+        """
+        with self._lock:
+            keys = [key for key in self._datasets
+                    if path is None or key[1] == path]
+            for key in keys:
+                self._close(self._datasets.pop(key))
+        return len(keys)
+
+    def close(self):
+        """Close all pooled datasets and empty the pool."""
+        self.evict()
+
+    def _drop_exited_threads(self):
+        exited = self._threads.pop_exited()
+        for key in [key for key in self._datasets if key[0] in exited]:
+            self._close(self._datasets.pop(key))
+
+    def _close(self, src):
+        if not src.closed:
+            src.close()
+            self.closes += 1
+
+
+class BlockCache(object):
+    """Byte-budgeted LRU cache of decoded source blocks.
+
+    Neighbouring chips in an analysis grid usually overlap (by about 44% of
+    each chip with the default 300m stride and 400m cell), so the same source
+    blocks are decompressed again for every chip that covers them. This
+    cache keeps decoded blocks in memory, keyed by dataset name and block
+    position, so it is shared by every handle and every call that reads the
+    same file. Pass it to :func:`cw_tiler.utils.tile_read_utm` as
+    `block_cache`.
+
+    Arguments
+    ---------
+    max_bytes : int, optional
+        Memory budget for decoded blocks. Defaults to 256 MB.
+
+    Attributes
+    ----------
+    hits : int
+        Number of block lookups served from memory.
+    misses : int
+        Number of blocks read and decoded from the source.
+    evictions : int
+        Number of blocks dropped to stay within `max_bytes`.
+    nbytes : int
+        Bytes currently held.
+
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    @property
+    def hit_rate(self):
+        """Fraction of block lookups served from memory."""
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
+
+    def clear(self):
+        """Drop all cached blocks. Statistics are kept."""
+        with self._lock:
+            self._blocks.clear()
+            self.nbytes = 0
+
+    def read(self, src, window, masks=False):
+        """Read a whole-pixel window of all bands, assembled from blocks.
+
+        Arguments
+        ---------
+        src : :py:class:`rasterio.io.DatasetReader`
+            Open source dataset.
+        window : :py:class:`rasterio.windows.Window`
+            Integer window to read. Parts outside of the dataset are filled
+            with ``0``.
+        masks : bool, optional
+            Read the dataset masks (as from
+            :py:meth:`rasterio.io.DatasetReader.read_masks`) instead of the
+            data. Defaults to ``False``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Array of shape ``(src.count, window.height, window.width)``.
+
+        """
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        height, width = int(window.height), int(window.width)
+        dtype = np.uint8 if masks else src.dtypes[0]
+        out = np.zeros((src.count, height, width), dtype=dtype)
+        block_h, block_w = src.block_shapes[0]
+        first_row = max(row_off, 0) // block_h
+        last_row = (min(row_off + height, src.height) - 1) // block_h
+        first_col = max(col_off, 0) // block_w
+        last_col = (min(col_off + width, src.width) - 1) // block_w
+        for block_row in range(first_row, last_row + 1):
+            for block_col in range(first_col, last_col + 1):
+                block_window = src.block_window(1, block_row, block_col)
+                block = self._get_block(src, block_row, block_col,
+                                        block_window, masks)
+                # overlap of the block with the requested window
+                r0 = max(block_window.row_off, row_off)
+                r1 = min(block_window.row_off + block_window.height,
+                         row_off + height)
+                c0 = max(block_window.col_off, col_off)
+                c1 = min(block_window.col_off + block_window.width,
+                         col_off + width)
+                if r1 <= r0 or c1 <= c0:
+                    continue
+                out[:, r0 - row_off:r1 - row_off, c0 - col_off:c1 - col_off] = \
+                    block[:, r0 - block_window.row_off:r1 - block_window.row_off,
+                          c0 - block_window.col_off:c1 - block_window.col_off]
+        return out
+
+    def _get_block(self, src, block_row, block_col, block_window, masks):
+        # overview datasets share the name of the full-resolution dataset
+        key = (src.name, src.shape, masks, block_row, block_col)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return block
+        if masks:
+            block = src.read_masks(window=block_window)
+        else:
+            block = src.read(window=block_window)
+        with self._lock:
+            self.misses += 1
+            if key not in self._blocks:
+                self._blocks[key] = block
+                self.nbytes += block.nbytes
+            while self.nbytes > self.max_bytes and len(self._blocks) > 1:
+                _, old_block = self._blocks.popitem(last=False)
+                self.nbytes -= old_block.nbytes
+                self.evictions += 1
+        return block
+
+
+_default_vrt_cache = VRTCache()
+_default_dataset_pool = DatasetPool()
+
+
+def get_vrt_cache():
+    """Get the module-level :class:`VRTCache` used by the tiling functions.
+
+    It keeps the datasets passed to the tiling functions alive until they
+    are closed or evicted; see :class:`VRTCache` . Datasets opened from
+    paths are owned by :func:`get_dataset_pool` and closed by it.
+    """
+    return _default_vrt_cache
+
+
+def get_dataset_pool():
+    """Get the module-level :class:`DatasetPool` used for path inputs."""
+    return _default_dataset_pool
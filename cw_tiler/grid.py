@@ -0,0 +1,428 @@
+"""cw_tiler.grid: lazy analysis grids for very large areas of interest."""
+
+from collections import OrderedDict
+import numpy as np
+from rasterio.warp import transform as transform_coords
+from . import main
+from . import utils
+
+
+class AnalysisGrid(object):
+    """Lazy, indexable form of :func:`cw_tiler.main.calculate_analysis_grid`.
+
+    Only the distinct x and y anchor coordinates are stored, so memory use
+    does not grow with the number of cells. Cells are produced on demand in
+    the chosen traversal `order`, and both ``len(grid)`` and ``grid[k]`` are
+    computed from the grid parameters.
+
+    Cells are addressed by a column index ``i`` (west to east) and a row
+    index ``r`` (north to south). The supported orders are:
+
+    ``"column"``
+        Outer loop west to east, inner loop south to north. This is the
+        order of :func:`cw_tiler.main.calculate_analysis_grid` when
+        `quad_space` is ``False``.
+    ``"row"``
+        Outer loop north to south, inner loop west to east, matching the
+        row-major layout of raster files.
+    ``"block"``
+        Row-major over blocks of `block_shape` cells, row-major within each
+        block.
+    ``"hilbert"``
+        Along a Hilbert curve, so that consecutive cells are spatial
+        neighbours.
+
+    Arguments
+    ---------
+    utm_bounds : list-like of shape ``(W, S, E, N)``
+        UTM coordinate limits of the input tile.
+    stride_size_meters : int, optional
+        Step size in both X and Y directions between cells in units of meters.
+        Defaults to ``300`` .
+    cell_size_meters : int, optional
+        Extent of each cell in both X and Y directions in units of meters.
+        Defaults to ``400`` .
+    quad_space : bool, optional
+        Compute :func:`cw_tiler.main.calculate_anchor_points` ``quad_space``
+        group ids for each cell. Defaults to ``False`` (all groups ``0``).
+    order : str, optional
+        Traversal order, one of ``["column", "row", "block", "hilbert"]``.
+        Defaults to ``"column"``.
+    block_shape : tuple of 2 ints, optional
+        ``(columns, rows)`` of cells per block for ``order="block"``.
+        Defaults to ``(8, 8)``.
+
+    """
+
+    orders = ('column', 'row', 'block', 'hilbert')
+
+    def __init__(self, utm_bounds, stride_size_meters=300,
+                 cell_size_meters=400, quad_space=False, order='column',
+                 block_shape=(8, 8)):
+        if order not in self.orders:
+            raise ValueError('order must be one of {}.'.format(self.orders))
+        xs, ys = main.calculate_anchor_axes(
+            utm_bounds, stride_size_meters=stride_size_meters)
+        self.xs = xs[xs + cell_size_meters < utm_bounds[2]]
+        self.ys = ys[ys + cell_size_meters < utm_bounds[3]]
+        self.cell_size_meters = cell_size_meters
+        self.quad_space = quad_space
+        self.order = order
+        self.block_shape = tuple(int(b) for b in block_shape)
+        self.n_cols = len(self.xs)
+        self.n_rows = len(self.ys)
+        self._hilbert_order = int(
+            np.ceil(np.log2(max(self.n_cols, self.n_rows, 1))))
+
+    def __len__(self):
+        return self.n_cols * self.n_rows
+
+    def __getitem__(self, index):
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('grid index out of range')
+        return self.take([index])[0]
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for cell in chunk:
+                yield cell
+
+    def take(self, indices):
+        """Get the cells at positions `indices` of the traversal order.
+
+        Arguments
+        ---------
+        indices : array-like of ints
+            Positions in ``range(len(self))``.
+
+        Returns
+        -------
+        cells : :class:`numpy.ndarray`
+            ``float64`` array of shape ``(len(indices), 4)`` of
+            ``[W, S, E, N]`` boundaries.
+
+        """
+        cols, rows = self.grid_indices(indices)
+        return self._cells(cols, rows)
+
+    def grid_indices(self, indices):
+        """Get ``(column, row)`` grid positions for traversal positions.
+
+        Arguments
+        ---------
+        indices : array-like of ints
+            Positions in ``range(len(self))``.
+
+        Returns
+        -------
+        cols, rows : :class:`numpy.ndarray`
+            Column (west to east) and row (north to south) indexes.
+
+        """
+        k = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if self.order == 'column':
+            cols = k // max(self.n_rows, 1)
+            rows = self.n_rows - 1 - k % max(self.n_rows, 1)
+        elif self.order == 'row':
+            rows = k // max(self.n_cols, 1)
+            cols = k % max(self.n_cols, 1)
+        elif self.order == 'block':
+            cols, rows = self._block_indices(k)
+        else:
+            cols = np.empty_like(k)
+            rows = np.empty_like(k)
+            for n, index in enumerate(k):
+                cols[n], rows[n] = self._hilbert_index(int(index))
+        return cols, rows
+
+    def groups(self, cols, rows):
+        """Get `quad_space` group ids for grid positions.
+
+        Arguments
+        ---------
+        cols, rows : :class:`numpy.ndarray`
+            Grid positions, as returned by :meth:`grid_indices`.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``int64`` group ids matching
+            :func:`cw_tiler.main.calculate_cell_array`.
+
+        """
+        if not self.quad_space:
+            return np.zeros(len(cols), dtype=np.int64)
+        y_idx = self.n_rows - 1 - rows
+        return (2 * (cols % 2) + y_idx % 2).astype(np.int64)
+
+    def chunks(self, chunksize=4096, return_groups=False):
+        """Iterate over the grid in blocks of up to `chunksize` cells.
+
+        Arguments
+        ---------
+        chunksize : int, optional
+            Maximum number of cells per block. Defaults to ``4096``.
+        return_groups : bool, optional
+            Also yield the `quad_space` group id of each cell. Defaults to
+            ``False``.
+
+        Yields
+        ------
+        cells : :class:`numpy.ndarray`
+            ``(M, 4)`` blocks of ``[W, S, E, N]`` boundaries in traversal
+            order, or ``(cells, groups)`` tuples if `return_groups` is
+            ``True``.
+
+        """
+        if self.order == 'hilbert':
+            positions = self._hilbert_chunks(chunksize)
+        else:
+            positions = (self.grid_indices(np.arange(
+                start, min(start + chunksize, len(self)), dtype=np.int64))
+                for start in range(0, len(self), chunksize))
+        for cols, rows in positions:
+            cells = self._cells(cols, rows)
+            if return_groups:
+                yield cells, self.groups(cols, rows)
+            else:
+                yield cells
+
+    def _cells(self, cols, rows):
+        cells = np.empty((len(cols), 4), dtype=np.float64)
+        cells[:, 0] = self.xs[cols]
+        cells[:, 1] = self.ys[self.n_rows - 1 - rows]
+        cells[:, 2:] = cells[:, :2] + self.cell_size_meters
+        return cells
+
+    def _block_indices(self, k):
+        block_w, block_h = self.block_shape
+        # every block row above the current one is full height.
+        block_row = k // (block_h * self.n_cols)
+        k = k - block_row * block_h * self.n_cols
+        height = np.minimum(block_h, self.n_rows - block_row * block_h)
+        block_col = k // (block_w * height)
+        k = k - block_col * block_w * height
+        width = np.minimum(block_w, self.n_cols - block_col * block_w)
+        rows = block_row * block_h + k // width
+        cols = block_col * block_w + k % width
+        return cols, rows
+
+    def _count_in_square(self, origin, size):
+        col, row = origin
+        width = max(0, min(col + size, self.n_cols) - col)
+        height = max(0, min(row + size, self.n_rows) - row)
+        return width * height
+
+    def _hilbert_square(self, prefix, level):
+        """Origin of the square covering Hilbert indexes of `prefix`."""
+        col, row = _hilbert_d2xy(self._hilbert_order,
+                                 np.array([prefix << (2 * level)]))
+        size = 1 << level
+        return (int(col[0]) // size * size, int(row[0]) // size * size)
+
+    def _hilbert_leaf(self, prefix, level):
+        start = prefix << (2 * level)
+        d = np.arange(start, start + (1 << (2 * level)), dtype=np.int64)
+        cols, rows = _hilbert_d2xy(self._hilbert_order, d)
+        keep = (cols < self.n_cols) & (rows < self.n_rows)
+        return cols[keep], rows[keep]
+
+    def _hilbert_leaves(self, prefix=0, level=None, leaf_level=5):
+        """Yield in-grid positions leaf square by leaf square."""
+        if level is None:
+            level = self._hilbert_order
+        origin = self._hilbert_square(prefix, level)
+        if self._count_in_square(origin, 1 << level) == 0:
+            return
+        if level <= leaf_level:
+            yield self._hilbert_leaf(prefix, level)
+            return
+        for quadrant in range(4):
+            for leaf in self._hilbert_leaves(4 * prefix + quadrant,
+                                             level - 1, leaf_level):
+                yield leaf
+
+    def _hilbert_chunks(self, chunksize):
+        cols, rows, count = [], [], 0
+        for leaf_cols, leaf_rows in self._hilbert_leaves():
+            cols.append(leaf_cols)
+            rows.append(leaf_rows)
+            count += len(leaf_cols)
+            while count >= chunksize:
+                all_cols = np.concatenate(cols)
+                all_rows = np.concatenate(rows)
+                yield all_cols[:chunksize], all_rows[:chunksize]
+                cols, rows = [all_cols[chunksize:]], [all_rows[chunksize:]]
+                count -= chunksize
+        if count:
+            yield np.concatenate(cols), np.concatenate(rows)
+
+    def _hilbert_index(self, index, leaf_level=5):
+        prefix, level = 0, self._hilbert_order
+        while level > leaf_level:
+            for quadrant in range(4):
+                child = 4 * prefix + quadrant
+                count = self._count_in_square(
+                    self._hilbert_square(child, level - 1), 1 << (level - 1))
+                if index < count:
+                    break
+                index -= count
+            prefix, level = child, level - 1
+        cols, rows = self._hilbert_leaf(prefix, level)
+        return cols[index], rows[index]
+
+
+def _hilbert_d2xy(order, d):
+    """Vectorized Hilbert curve index to ``(x, y)`` on a ``2**order`` grid."""
+    t = np.array(d, dtype=np.int64)
+    x = np.zeros_like(t)
+    y = np.zeros_like(t)
+    s = 1
+    while s < (1 << order):
+        rx = 1 & (t // 2)
+        ry = 1 & (t ^ rx)
+        swap = ry == 0
+        flip = swap & (rx == 1)
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        x += s * rx
+        y += s * ry
+        t //= 4
+        s *= 2
+    return x, y
+
+
+def block_ranges(cells, source, dst_crs=None):
+    """Get the range of internal source blocks each cell's read touches.
+
+    Arguments
+    ---------
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs`. See :func:`cw_tiler.main.cells_to_array`.
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset.
+    dst_crs : str, optional
+        Coordinate reference system of `cells`. Defaults to the CRS of
+        `source`.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        ``int64`` array of shape ``(N, 4)`` of inclusive
+        ``[first_col, first_row, last_col, last_row]`` block indexes, clipped
+        to the dataset. Cells that miss the dataset have ``last < first``.
+
+    """
+    src = utils.get_dataset(source)
+    cell_array = main.cells_to_array(cells)
+    xs = cell_array[:, [0, 2, 2, 0]].ravel()
+    ys = cell_array[:, [1, 1, 3, 3]].ravel()
+    if dst_crs is not None and not utils.crs_equivalent(src.crs, dst_crs):
+        xs, ys = transform_coords(dst_crs, src.crs, xs, ys)
+    inverse = ~src.transform
+    cols = inverse.a * np.asarray(xs) + inverse.b * np.asarray(ys) + inverse.c
+    rows = inverse.d * np.asarray(xs) + inverse.e * np.asarray(ys) + inverse.f
+    cols = cols.reshape(-1, 4)
+    rows = rows.reshape(-1, 4)
+    block_h, block_w = src.block_shapes[0]
+    first_col = np.floor(np.clip(cols.min(axis=1), 0, src.width) / block_w)
+    first_row = np.floor(np.clip(rows.min(axis=1), 0, src.height) / block_h)
+    last_col = np.ceil(np.clip(cols.max(axis=1), 0, src.width) / block_w) - 1
+    last_row = np.ceil(np.clip(rows.max(axis=1), 0, src.height) / block_h) - 1
+    return np.stack([first_col, first_row, last_col, last_row],
+                    axis=1).astype(np.int64)
+
+
+def order_cells_by_block(cells, source, dst_crs=None, groups=None):
+    """Order cells so that consecutive reads share decoded source blocks.
+
+    Cells are sorted row-major by the first internal block their read
+    touches, so chips are read in the order GDAL stores the data. For
+    striped GeoTIFFs this walks down the strips; for tiled GeoTIFFs it walks
+    across each row of tiles. If `groups` is given (e.g. `quad_space`
+    group ids from :func:`cw_tiler.main.calculate_cell_array`), groups are
+    kept contiguous and in ascending order, and cells are sorted within
+    each group.
+
+    Arguments
+    ---------
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs`.
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset.
+    dst_crs : str, optional
+        Coordinate reference system of `cells`. Defaults to the CRS of
+        `source`.
+    groups : array-like of ints, optional
+        Group id of each cell.
+
+    Returns
+    -------
+    order : :class:`numpy.ndarray`
+        Indices into `cells` in the planned read order.
+
+    """
+    ranges = block_ranges(cells, source, dst_crs=dst_crs)
+    keys = [ranges[:, 0], ranges[:, 1]]
+    if groups is not None:
+        keys.append(np.asarray(groups))
+    # np.lexsort sorts by the last key first.
+    return np.lexsort(keys)
+
+
+def estimate_blocks_decoded(cells, source, order=None, dst_crs=None,
+                            cache_bytes=64 * 2 ** 20):
+    """Estimate how many source blocks each chip read will decode.
+
+    Simulates an LRU block cache of `cache_bytes` (GDAL's block cache,
+    ``GDAL_CACHEMAX``) over the reads in `order`. Comparing the mean of the
+    result for different orders shows which one decodes fewer blocks,
+    without reading any pixels.
+
+    Arguments
+    ---------
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs`.
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset.
+    order : array-like of ints, optional
+        Read order as indices into `cells`, e.g. from
+        :func:`order_cells_by_block`. Defaults to the order of `cells`.
+    dst_crs : str, optional
+        Coordinate reference system of `cells`. Defaults to the CRS of
+        `source`.
+    cache_bytes : int, optional
+        Size of the simulated block cache in bytes. Defaults to 64 MB.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        Number of blocks decoded (cache misses) for each chip, in read
+        order. Use ``.mean()`` for the expected blocks decoded per chip.
+
+    """
+    src = utils.get_dataset(source)
+    ranges = block_ranges(cells, src, dst_crs=dst_crs)
+    if order is not None:
+        ranges = ranges[np.asarray(order)]
+    block_h, block_w = src.block_shapes[0]
+    block_bytes = (block_h * block_w * src.count *
+                   np.dtype(src.dtypes[0]).itemsize)
+    capacity = max(1, int(cache_bytes // block_bytes))
+    cache = OrderedDict()
+    decoded = np.zeros(len(ranges), dtype=np.int64)
+    for n, (first_col, first_row, last_col, last_row) in enumerate(ranges):
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                if (row, col) in cache:
+                    cache.move_to_end((row, col))
+                    continue
+                decoded[n] += 1
+                cache[(row, col)] = True
+                if len(cache) > capacity:
+                    cache.popitem(last=False)
+    return decoded
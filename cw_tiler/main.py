@@ -2,25 +2,32 @@ import os
 import rasterio
 from rasterio.warp import transform_bounds
 from rasterio.io import DatasetReader
+from rasterio.windows import Window
+from affine import Affine
 import math
+import warnings
 from rio_tiler.errors import TileOutsideBounds
 from . import utils
+from .cache import VRTCache
 import numpy as np
 
 
 def tile_utm_source(src, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
-                    nodata=None, alpha=None, dst_crs='epsg:4326'):
+                    nodata=None, alpha=None, dst_crs='epsg:4326',
+                    vrt_cache=None, out=None, out_mask=None,
+                    overviews=False, native=False):
     """
     Create a UTM tile from a :py:class:`rasterio.Dataset` in memory.
 
     Arguments
     ---------
-    src : :py:class:`rasterio.Dataset`
-        Source imagery dataset to tile.
+    src : str, :py:class:`rasterio.Dataset` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset to tile, or a path to it. Passing a
+        :class:`cw_tiler.utils.SourceInfo` avoids recomputing the source
+        bounds for every tile.
     ll_x : int or float
         Lower left x position (i.e. Western bound).
-    ll_y : int or f
-    loat
+    ll_y : int or float
         Lower left y position (i.e. Southern bound).
     ur_x : int or float
         Upper right x position (i.e. Eastern bound).
@@ -39,6 +46,20 @@ def tile_utm_source(src, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
         specified by `src`.
     dst_crs : str, optional
         Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache of open VRTs to read from. Defaults to ``None``, which uses the
+        module-level cache. See :func:`cw_tiler.utils.tile_read_utm`.
+    out : :class:`numpy.ndarray`, optional
+        ``(C, Y, X)`` array to read the tile into instead of allocating one.
+        See :func:`cw_tiler.utils.tile_read_utm`.
+    out_mask : :class:`numpy.ndarray`, optional
+        ``(Y, X)`` array to write the mask into instead of allocating one.
+    overviews : bool, optional
+        Read downsampled tiles from the best overview level of the source.
+        See :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+    native : bool, optional
+        Read native-resolution pixels even for downsampled tiles. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
 
     Returns
     -------
@@ -58,21 +79,25 @@ def tile_utm_source(src, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
 
     """
 
-    wgs_bounds = transform_bounds(
-        *[src.crs, dst_crs] + list(src.bounds), densify_pts=21)
+    wgs_bounds = _source_bounds(src, dst_crs)
 
-    indexes = indexes if indexes is not None else src.indexes
+    indexes = (indexes if indexes is not None
+               else utils.get_dataset(src).indexes)
     tile_bounds = (ll_x, ll_y, ur_x, ur_y)
     if not utils.tile_exists_utm(wgs_bounds, tile_bounds):
         raise TileOutsideBounds(
-            'Tile {}/{}/{}/{} is outside image bounds'.format(tile_bounds))
+            'Tile {}/{}/{}/{} is outside image bounds'.format(*tile_bounds))
 
     return utils.tile_read_utm(src, tile_bounds, tilesize, indexes=indexes,
-                               nodata=nodata, alpha=alpha, dst_crs=dst_crs)
+                               nodata=nodata, alpha=alpha, dst_crs=dst_crs,
+                               vrt_cache=vrt_cache, out=out,
+                               out_mask=out_mask, overviews=overviews,
+                               native=native)
 
 
 def tile_utm(source, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
-             nodata=None, alpha=None, dst_crs='epsg:4326'):
+             nodata=None, alpha=None, dst_crs='epsg:4326', vrt_cache=None,
+             out=None, out_mask=None, overviews=False, native=False):
     """
     Create a UTM tile from a file or a :py:class:`rasterio.Dataset` in memory.
 
@@ -81,7 +106,7 @@ def tile_utm(source, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
 
     Arguments
     ---------
-    source : :py:class:`rasterio.Dataset`
+    source : str, :py:class:`rasterio.Dataset` or :class:`cw_tiler.utils.SourceInfo`
         Source imagery dataset to tile.
     ll_x : int or float
         Lower left x position (i.e. Western bound).
@@ -104,6 +129,20 @@ def tile_utm(source, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
         specified by `src`.
     dst_crs : str, optional
         Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache of open VRTs to read from. Defaults to ``None``, which uses the
+        module-level cache. See :func:`cw_tiler.utils.tile_read_utm`.
+    out : :class:`numpy.ndarray`, optional
+        ``(C, Y, X)`` array to read the tile into instead of allocating one.
+        See :func:`cw_tiler.utils.tile_read_utm`.
+    out_mask : :class:`numpy.ndarray`, optional
+        ``(Y, X)`` array to write the mask into instead of allocating one.
+    overviews : bool, optional
+        Read downsampled tiles from the best overview level of the source.
+        See :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+    native : bool, optional
+        Read native-resolution pixels even for downsampled tiles. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
 
     Returns
     -------
@@ -123,16 +162,13 @@ def tile_utm(source, ll_x, ll_y, ur_x, ur_y, indexes=None, tilesize=256,
 
     """
 
-    if isinstance(source, DatasetReader):
-        src = source
-    elif os.path.exists(source):
-        src = rasterio.open(source)  # read in the file
-    else:
-        raise ValueError('Source is not a rasterio.Dataset or a valid path.')
+    src = _check_source(source)
 
     return tile_utm_source(src, ll_x, ll_y, ur_x, ur_y, indexes=indexes,
                            tilesize=tilesize, nodata=nodata, alpha=alpha,
-                           dst_crs=dst_crs)
+                           dst_crs=dst_crs, vrt_cache=vrt_cache, out=out,
+                           out_mask=out_mask, overviews=overviews,
+                           native=native)
 
 
 def get_chip(source, ll_x, ll_y, gsd,
@@ -140,7 +176,12 @@ def get_chip(source, ll_x, ll_y, gsd,
              indexes=None,
              tilesize=256,
              nodata=None,
-             alpha=None):
+             alpha=None,
+             vrt_cache=None,
+             out=None,
+             out_mask=None,
+             overviews=False,
+             native=False):
     """Get an image tile of specific pixel size.
 
     This wrapper function permits passing of `ll_x`, `ll_y`, `gsd`, and
@@ -149,7 +190,7 @@ def get_chip(source, ll_x, ll_y, gsd,
 
     Arguments
     ---------
-    source : :py:class:`rasterio.Dataset`
+    source : str, :py:class:`rasterio.Dataset` or :class:`cw_tiler.utils.SourceInfo`
         Source imagery dataset to tile.
     ll_x : int or float
         Lower left x position (i.e. Western bound).
@@ -159,9 +200,10 @@ def get_chip(source, ll_x, ll_y, gsd,
         Ground sample distance of the source imagery in meter/pixel units.
     utm_crs : :py:class:`rasterio.crs.CRS`, optional
         UTM coordinate reference system string for the imagery. If not
-        provided, this is calculated using
+        provided, this is taken from `source` if it is a
+        :class:`cw_tiler.utils.SourceInfo`, or calculated using
         :func:`cw_tiler.utils.get_wgs84_bounds` and
-        :func:`cw_tiler.utils.calculate_UTM_crs` .
+        :func:`cw_tiler.utils.calculate_UTM_crs` otherwise.
     indexes : tuple of 3 ints, optional
         Band indexes for the output. By default, extracts all of the
         indexes from `source`.
@@ -173,6 +215,20 @@ def get_chip(source, ll_x, ll_y, gsd,
     alpha : int, optional
         Alpha band index for tiling. By default, uses the same band as
         specified by `source`.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache of open VRTs to read from. Defaults to ``None``, which uses the
+        module-level cache. See :func:`cw_tiler.utils.tile_read_utm`.
+    out : :class:`numpy.ndarray`, optional
+        ``(C, Y, X)`` array to read the tile into instead of allocating one.
+        See :func:`cw_tiler.utils.tile_read_utm`.
+    out_mask : :class:`numpy.ndarray`, optional
+        ``(Y, X)`` array to write the mask into instead of allocating one.
+    overviews : bool, optional
+        Read downsampled tiles from the best overview level of the source.
+        See :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+    native : bool, optional
+        Read native-resolution pixels even for downsampled tiles. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
 
     Returns
     -------
@@ -194,18 +250,315 @@ def get_chip(source, ll_x, ll_y, gsd,
     ur_x = ll_x + gsd * tilesize
     ur_y = ll_y + gsd * tilesize
 
-    if isinstance(source, DatasetReader):
-        src = source
-    else:
-        src = rasterio.open(source)
-
     if not utm_crs:
-        wgs_bounds = utils.get_wgs84_bounds(src)
-        utm_crs = utils.calculate_UTM_crs(wgs_bounds)
+        if isinstance(source, utils.SourceInfo):
+            utm_crs = source.utm_crs
+        else:
+            wgs_bounds = utils.get_wgs84_bounds(source)
+            utm_crs = utils.calculate_UTM_crs(wgs_bounds)
 
     return tile_utm(source, ll_x, ll_y, ur_x, ur_y, indexes=indexes,
                     tilesize=tilesize, nodata=nodata, alpha=alpha,
-                    dst_crs=utm_crs)
+                    dst_crs=utm_crs, vrt_cache=vrt_cache, out=out,
+                    out_mask=out_mask, overviews=overviews, native=native)
+
+
+def tile_utm_batch(source, cells, indexes=None, tilesize=256, nodata=None,
+                   alpha=None, dst_crs='epsg:4326', vrt_cache=None,
+                   return_exceptions=False, mask=True, out=None,
+                   out_mask=None, overviews=False, native=False):
+    """Create UTM tiles for many cells from one source in a single pass.
+
+    This is equivalent to calling :func:`tile_utm` once per cell, but the
+    source bounds transformation, VRT setup and bounds checks are done once
+    for the whole batch rather than once per cell.
+
+    Arguments
+    ---------
+    source : str, :py:class:`rasterio.Dataset` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset to tile, or a path to it.
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs` with shape ``[W, S, E, N]``. Either the
+        ``cells_list_dict`` output of :func:`calculate_analysis_grid` (cells
+        are yielded group by group, in key order) or a sequence of cells.
+    indexes : tuple of 3 ints, optional
+        Band indexes for the output. By default, extracts all of the
+        indexes from `source`.
+    tilesize : int, optional
+        Output image X and Y pixel extent. Defaults to ``256``.
+    nodata : int or float, optional
+        Value to use for `nodata` pixels during tiling. By default, uses
+        the existing `nodata` value in `source`.
+    alpha : int, optional
+        Alpha band index for tiling. By default, uses the same band as
+        specified by `source`.
+    dst_crs : str, optional
+        Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache of open VRTs to read from. Defaults to ``None``, which uses the
+        module-level cache. If ``False``, a single VRT is built for the batch
+        and closed when the batch is exhausted.
+    return_exceptions : bool, optional
+        If ``True``, a :py:exc:`rio_tiler.errors.TileOutsideBounds` instance
+        is yielded in place of the tile for each cell outside of the source
+        bounds and tiling continues. Defaults to ``False`` (raise).
+    mask : bool or str, optional
+        How to compute the tile masks. ``False`` skips them. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``True``.
+    out : :class:`numpy.ndarray`, optional
+        ``(N, C, Y, X)`` array, one slot per cell, to read the tiles into.
+        Each yielded `data` is then a view of its slot.
+    out_mask : :class:`numpy.ndarray`, optional
+        ``(N, Y, X)`` array, one slot per cell, to write the masks into.
+    overviews : bool, optional
+        Read downsampled tiles from the best overview level of the source.
+        See :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+    native : bool, optional
+        Read native-resolution pixels even for downsampled tiles. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+
+    Yields
+    ------
+    ``(data, mask, window, window_transform)`` tuple
+        One tuple per cell, in the same order as `cells`. See
+        :func:`tile_utm` for details. If a cell lies outside of the source
+        bounds, :py:exc:`rio_tiler.errors.TileOutsideBounds` is raised when
+        that cell is reached, as :func:`tile_utm` would, unless
+        `return_exceptions` is ``True``.
+
+    """
+    src = _check_source(source)
+
+    cell_array = cells_to_array(cells)
+    inside = _cells_inside_source(cell_array, src, dst_crs)
+
+    indexes = (indexes if indexes is not None
+               else utils.get_dataset(src).indexes)
+    batch_cache = VRTCache(maxsize=1) if vrt_cache is False else vrt_cache
+    try:
+        for i, (tile_bounds, tile_inside) in enumerate(zip(cell_array,
+                                                           inside)):
+            tile_bounds = tuple(tile_bounds)
+            if not tile_inside:
+                err = TileOutsideBounds(
+                    'Tile {}/{}/{}/{} is outside image bounds'.format(
+                        *tile_bounds))
+                if return_exceptions:
+                    yield err
+                    continue
+                raise err
+            yield utils.tile_read_utm(
+                src, tile_bounds, tilesize, indexes=indexes, nodata=nodata,
+                alpha=alpha, dst_crs=dst_crs, vrt_cache=batch_cache,
+                mask=mask, out=None if out is None else out[i],
+                out_mask=None if out_mask is None else out_mask[i],
+                overviews=overviews, native=native)
+    finally:
+        if vrt_cache is False:
+            batch_cache.close()
+
+
+def tile_utm_strips(source, cells, indexes=None, tilesize=256, nodata=None,
+                    alpha=None, dst_crs='epsg:4326', vrt_cache=None,
+                    return_exceptions=False, mask=True, overviews=False,
+                    native=False):
+    """Create UTM tiles for a regular grid of cells, one row strip at a time.
+
+    Cells that share their south and north bounds form a row. Each row is
+    read from the source with a single warped read into a strip of height
+    `tilesize` covering all of its cells, and the tiles are cut out of the
+    strip as array views. Where cells overlap (stride smaller than the cell
+    size), the overlap is warped once rather than once per cell. Only one
+    strip is held at a time, so memory is bounded by the strip height times
+    the row width.
+
+    A row is read as a strip only if its cells all have the same size and
+    their offsets from the first cell are whole output pixels; otherwise
+    its cells are tiled one by one as with :func:`tile_utm_batch`. Values
+    may differ from :func:`tile_utm` by resampling rounding.
+
+    Arguments
+    ---------
+    source : str, :py:class:`rasterio.Dataset` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset to tile, or a path to it.
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs` with shape ``[W, S, E, N]``, e.g. the
+        ``cells_list_dict`` output of :func:`calculate_analysis_grid`.
+    indexes : tuple of 3 ints, optional
+        Band indexes for the output. By default, extracts all of the
+        indexes from `source`.
+    tilesize : int, optional
+        Output image X and Y pixel extent. Defaults to ``256``.
+    nodata : int or float, optional
+        Value to use for `nodata` pixels during tiling. By default, uses
+        the existing `nodata` value in `source`.
+    alpha : int, optional
+        Alpha band index for tiling. By default, uses the same band as
+        specified by `source`.
+    dst_crs : str, optional
+        Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache of open VRTs to read from. Defaults to ``None``, which uses the
+        module-level cache. If ``False``, a single VRT is built for the call
+        and closed when the generator is exhausted.
+    return_exceptions : bool, optional
+        If ``True``, a :py:exc:`rio_tiler.errors.TileOutsideBounds` instance
+        is yielded in place of the tile for each cell outside of the source
+        bounds and tiling continues. Defaults to ``False`` (raise).
+    mask : bool or str, optional
+        How to compute the tile masks. ``False`` skips them. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``True``.
+    overviews : bool, optional
+        Read downsampled tiles from the best overview level of the source.
+        See :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+    native : bool, optional
+        Read native-resolution pixels even for downsampled tiles. See
+        :func:`cw_tiler.utils.tile_read_utm`. Defaults to ``False``.
+
+    Yields
+    ------
+    ``(i, (data, mask, window, window_transform))`` tuple
+        The position `i` of the cell in `cells` (as ordered by
+        :func:`cells_to_array`) and its tile; see :func:`tile_utm`. Tiles
+        are yielded row by row, from north to south and west to east, and
+        `data` and `mask` are views into the row strip: copy them to keep
+        them beyond the next strip without holding the whole strip.
+
+    """
+    src = _check_source(source)
+
+    cell_array = cells_to_array(cells)
+    inside = _cells_inside_source(cell_array, src, dst_crs)
+    for i in np.flatnonzero(~inside):
+        err = TileOutsideBounds(
+            'Tile {}/{}/{}/{} is outside image bounds'.format(
+                *cell_array[i]))
+        if not return_exceptions:
+            raise err
+        yield int(i), err
+
+    indexes = (indexes if indexes is not None
+               else utils.get_dataset(src).indexes)
+    tile_kwargs = dict(indexes=indexes, nodata=nodata, alpha=alpha,
+                       dst_crs=dst_crs, mask=mask, overviews=overviews,
+                       native=native)
+    batch_cache = VRTCache(maxsize=1) if vrt_cache is False else vrt_cache
+    try:
+        for row in _cell_rows(cell_array, inside):
+            offsets = _strip_offsets(cell_array[row], tilesize)
+            if offsets is None:
+                for i in row:
+                    yield int(i), utils.tile_read_utm(
+                        src, tuple(cell_array[i]), tilesize,
+                        vrt_cache=batch_cache, **tile_kwargs)
+                continue
+            strip_bounds = (cell_array[row[0], 0], cell_array[row[0], 1],
+                            cell_array[row[-1], 2], cell_array[row[0], 3])
+            strip_width = offsets[-1] + tilesize
+            data, strip_mask, window, window_transform = utils.tile_read_utm(
+                src, strip_bounds, (tilesize, strip_width),
+                vrt_cache=batch_cache, **tile_kwargs)
+            x_scale = window.width / float(strip_width)
+            for i, offset in zip(row, offsets):
+                tile_window = Window(
+                    window.col_off + offset * x_scale, window.row_off,
+                    tilesize * x_scale, window.height)
+                tile_mask = (None if strip_mask is None
+                             else strip_mask[..., offset:offset + tilesize])
+                yield int(i), (
+                    data[..., offset:offset + tilesize],
+                    tile_mask,
+                    tile_window,
+                    window_transform * Affine.translation(offset, 0))
+    finally:
+        if vrt_cache is False:
+            batch_cache.close()
+
+
+def _cell_rows(cell_array, inside):
+    """Indices of the cells in `inside` grouped by row, north to south."""
+    idx = np.flatnonzero(inside)
+    if not len(idx):
+        return []
+    # sort by row (north then south edge, descending) and then by west edge
+    order = np.lexsort((cell_array[idx, 0], -cell_array[idx, 1],
+                        -cell_array[idx, 3]))
+    idx = idx[order]
+    rows = cell_array[idx][:, [1, 3]]
+    breaks = np.flatnonzero(np.any(np.diff(rows, axis=0) != 0, axis=1)) + 1
+    return np.split(idx, breaks)
+
+
+def _strip_offsets(row_cells, tilesize, tol=1e-6):
+    """Whole-pixel column offsets of cells in a strip, or ``None``.
+
+    Returns ``None`` if the cells differ in size or do not fall on whole
+    output pixels relative to the first cell.
+    """
+    widths = row_cells[:, 2] - row_cells[:, 0]
+    heights = row_cells[:, 3] - row_cells[:, 1]
+    if not (np.allclose(widths, widths[0], rtol=0, atol=tol * widths[0]) and
+            np.allclose(heights, widths[0], rtol=0, atol=tol * widths[0])):
+        return None
+    offsets = (row_cells[:, 0] - row_cells[0, 0]) * tilesize / widths[0]
+    rounded = np.round(offsets)
+    if np.any(np.abs(offsets - rounded) > tol * tilesize):
+        return None
+    return rounded.astype(int)
+
+
+def _check_source(source):
+    """Return `source` if it is a dataset, a SourceInfo or an existing path.
+
+    A path is kept as is, so that tiles can be read from its overviews and
+    from the VRT cache.
+    """
+    if isinstance(source, (DatasetReader, utils.SourceInfo)) or \
+            os.path.exists(source):
+        return source
+    raise ValueError('Source is not a rasterio.Dataset or a valid path.')
+
+
+def _source_bounds(src, dst_crs):
+    """Bounds of `src` in `dst_crs`, memoized if `src` is a SourceInfo.
+
+    `src` may also be a path or an open dataset.
+    """
+    if isinstance(src, utils.SourceInfo):
+        return src.bounds_in(dst_crs)
+    src = utils.get_dataset(src)
+    return transform_bounds(
+        *[src.crs, dst_crs] + list(src.bounds), densify_pts=21)
+
+
+def _cells_inside_source(cell_array, src, dst_crs):
+    """Mask of the cells in `cell_array` that intersect the bounds of `src`."""
+    src_bounds = _source_bounds(src, dst_crs)
+    return ((cell_array[:, 0] <= src_bounds[2]) &
+            (cell_array[:, 2] >= src_bounds[0]) &
+            (cell_array[:, 1] <= src_bounds[3]) &
+            (cell_array[:, 3] >= src_bounds[1]))
+
+
+def cells_to_array(cells):
+    """Convert cell boundaries to an ``(N, 4)`` array.
+
+    Arguments
+    ---------
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Either a ``cells_list_dict`` from :func:`calculate_analysis_grid`,
+        whose groups are concatenated in key order, or a sequence of
+        ``[W, S, E, N]`` boundaries.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        ``float64`` array of shape ``(N, 4)``.
+
+    """
+    if isinstance(cells, dict):
+        cells = [cell for key in cells for cell in cells[key]]
+    return np.asarray(cells, dtype=np.float64).reshape(-1, 4)
 
 
 def calculate_anchor_points(utm_bounds, stride_size_meters=400, extend=False,
@@ -247,6 +600,42 @@ def calculate_anchor_points(utm_bounds, stride_size_meters=400, extend=False,
     :obj:`dict` with a single key, ``0`` , that corresponds to a list of all
     of the generated anchor points. Each anchor point in the list(s) is an
     ``[x, y]`` pair of UTM coordinates denoting the SW corner of a chip.
+    The coordinates are NumPy scalars: integers if `stride_size_meters` is
+    an integer, and ``float64`` otherwise.
+
+    """
+    anchors, groups = calculate_anchor_array(
+        utm_bounds, stride_size_meters=stride_size_meters, extend=extend,
+        quad_space=quad_space)
+    # the rounded bounds are integers, so the stride sets the anchor dtype
+    anchors = anchors.astype(np.result_type(0, stride_size_meters))
+    if quad_space:
+        keys = [0, 1, 2, 3]
+    else:
+        keys = [0]
+    return {key: [list(anchor) for anchor in anchors[groups == key]]
+            for key in keys}
+
+
+def calculate_anchor_axes(utm_bounds, stride_size_meters=400, extend=False):
+    """Get the distinct x and y anchor coordinates of a chip grid.
+
+    Every anchor point from :func:`calculate_anchor_points` is an ``[x, y]``
+    pair drawn from these two axes.
+
+    Arguments
+    ---------
+    utm_bounds : tuple of 4 floats
+        See :func:`calculate_anchor_points` .
+    stride_size_meters : int, optional
+        See :func:`calculate_anchor_points` . Defaults to ``400``.
+    extend : bool, optional
+        See :func:`calculate_anchor_points` . Defaults to ``False``.
+
+    Returns
+    -------
+    xs, ys : :class:`numpy.ndarray`
+        ``float64`` arrays of ascending x and y anchor coordinates.
 
     """
     if extend:
@@ -255,30 +644,62 @@ def calculate_anchor_points(utm_bounds, stride_size_meters=400, extend=False,
         max_x = math.ceil(utm_bounds[2])
         max_y = math.ceil(utm_bounds[3])
     else:
-        print("NoExtend")
-        print('UTM_Bounds: {}'.format(utm_bounds))
         min_x = math.ceil(utm_bounds[0])
         min_y = math.ceil(utm_bounds[1])
         max_x = math.floor(utm_bounds[2])
         max_y = math.floor(utm_bounds[3])
 
+    xs = np.arange(min_x, max_x, stride_size_meters, dtype=np.float64)
+    ys = np.arange(min_y, max_y, stride_size_meters, dtype=np.float64)
+    return xs, ys
+
+
+def calculate_anchor_array(utm_bounds, stride_size_meters=400, extend=False,
+                           quad_space=False):
+    """Vectorized form of :func:`calculate_anchor_points`.
+
+    Arguments
+    ---------
+    utm_bounds : tuple of 4 floats
+        See :func:`calculate_anchor_points` .
+    stride_size_meters : int, optional
+        See :func:`calculate_anchor_points` . Defaults to ``400``.
+    extend : bool, optional
+        See :func:`calculate_anchor_points` . Defaults to ``False``.
+    quad_space : bool, optional
+        See :func:`calculate_anchor_points` . Defaults to ``False``.
+
+    Returns
+    -------
+    anchors : :class:`numpy.ndarray`
+        ``float64`` array of shape ``(N, 2)`` of ``[x, y]`` SW chip corners,
+        ordered as :func:`calculate_anchor_points` visits them (outer loop
+        over x, inner loop over y).
+    groups : :class:`numpy.ndarray`
+        ``int64`` array of shape ``(N,)`` giving the `quad_space` subset
+        (``0`` - ``3``) of each anchor. All ``0`` if `quad_space` is
+        ``False``.
+
+    """
+    xs, ys = calculate_anchor_axes(utm_bounds,
+                                   stride_size_meters=stride_size_meters,
+                                   extend=extend)
+    return _anchor_grid(xs, ys, quad_space=quad_space)
+
+
+def _anchor_grid(xs, ys, quad_space=False):
+    """Outer product of anchor axes in :func:`calculate_anchor_points` order."""
+    anchors = np.empty((len(xs) * len(ys), 2), dtype=np.float64)
+    anchors[:, 0] = np.repeat(xs, len(ys))
+    anchors[:, 1] = np.tile(ys, len(xs))
     if quad_space:
-        print("quad_space")
-        row_cell = np.asarray([[0, 1], [2, 3]])
-        anchor_point_list_dict = {0: [], 1: [], 2: [], 3: []}
+        row_idx = np.repeat(np.arange(len(xs)), len(ys))
+        col_idx = np.tile(np.arange(len(ys)), len(xs))
+        groups = 2 * (row_idx % 2) + col_idx % 2
     else:
-        anchor_point_list_dict = {0: []}
-
-    for rowidx, x in enumerate(np.arange(min_x, max_x, stride_size_meters)):
-        for colidx, y in enumerate(np.arange(min_y, max_y,
-                                             stride_size_meters)):
-            if quad_space:
-                anchor_point_list_dict[
-                    row_cell[rowidx % 2, colidx % 2]].append([x, y])
-            else:
-                anchor_point_list_dict[0].append([x, y])
+        groups = np.zeros(len(anchors), dtype=np.int64)
 
-    return anchor_point_list_dict
+    return anchors, groups.astype(np.int64)
 
 
 def calculate_cells(anchor_point_list_dict, cell_size_meters, utm_bounds=[]):
@@ -312,29 +733,170 @@ def calculate_cells(anchor_point_list_dict, cell_size_meters, utm_bounds=[]):
     """
     cells_list_dict = {}
     for anchor_point_list_id, anchor_point_list in anchor_point_list_dict.items():
-        cells_list = []
-        for anchor_point in anchor_point_list:
-            if utm_bounds:
-                if (anchor_point[0] + cell_size_meters < utm_bounds[2]) and (
-                        anchor_point[1] + cell_size_meters < utm_bounds[3]):
-                    cells_list.append([anchor_point[0], anchor_point[1],
-                                       anchor_point[0] + cell_size_meters,
-                                       anchor_point[1] + cell_size_meters])
-                else:
-                    pass
-            else:  # include it regardless of extending beyond bounds
-                cells_list.append([anchor_point[0], anchor_point[1],
-                                   anchor_point[0] + cell_size_meters,
-                                   anchor_point[1] + cell_size_meters])
-
-        cells_list_dict[anchor_point_list_id] = cells_list
+        anchors = np.asarray(anchor_point_list, dtype=np.float64).reshape(-1, 2)
+        cells = _anchors_to_cells(anchors, cell_size_meters,
+                                  utm_bounds=utm_bounds)
+        cells_list_dict[anchor_point_list_id] = cells.tolist()
 
     return cells_list_dict
 
 
+def calculate_cell_array(utm_bounds, stride_size_meters=300,
+                         cell_size_meters=400, quad_space=False,
+                         extend=False, src_transform=None, decimation=1):
+    """Vectorized form of :func:`calculate_analysis_grid`.
+
+    Builds the same cells as :func:`calculate_analysis_grid` as flat arrays
+    rather than nested lists, which avoids creating millions of small Python
+    objects for large areas of interest. Use :func:`cell_array_to_dict` to
+    convert the result to a ``cells_list_dict``.
+
+    Arguments
+    ---------
+    utm_bounds : list-like of shape ``(W, S, E, N)``
+        UTM coordinate limits of the input tile. Cells which extend beyond
+        these limits are dropped, as in :func:`calculate_cells` .
+    stride_size_meters : int, optional
+        Step size in both X and Y directions between cells in units of meters.
+        Defaults to ``300`` .
+    cell_size_meters : int, optional
+        Extent of each cell in both X and Y directions in units of meters.
+        Defaults to ``400`` .
+    quad_space : bool, optional
+        See :func:`calculate_anchor_points` . ``quad_space`` . Defaults to
+        ``False`` .
+    extend : bool, optional
+        See :func:`calculate_anchor_points` . ``extend`` . Defaults to
+        ``False`` . Ignored if `src_transform` is provided.
+    src_transform : :py:class:`affine.Affine`, optional
+        North-up affine transformation of the source pixel grid, in the same
+        CRS as `utm_bounds`. If provided, cells are snapped to the pixel
+        grid: anchors fall on pixel edges inside `utm_bounds`, and stride and
+        cell size are rounded to whole multiples of `decimation` pixels.
+    decimation : int, optional
+        Integer downsampling factor used when snapping. Cells are a whole
+        number of ``decimation``-pixel steps wide. Defaults to ``1``
+        (native resolution).
+
+    Returns
+    -------
+    cells : :class:`numpy.ndarray`
+        ``float64`` array of shape ``(N, 4)`` of ``[W, S, E, N]`` boundaries
+        in UTM coordinates.
+    groups : :class:`numpy.ndarray`
+        ``int64`` array of shape ``(N,)`` giving the `quad_space` subset of
+        each cell. All ``0`` if `quad_space` is ``False``.
+
+    """
+    if src_transform is not None:
+        return _snapped_cell_array(utm_bounds, stride_size_meters,
+                                   cell_size_meters, src_transform,
+                                   decimation=decimation,
+                                   quad_space=quad_space)
+    anchors, groups = calculate_anchor_array(
+        utm_bounds, stride_size_meters=stride_size_meters, extend=extend,
+        quad_space=quad_space)
+    keep = _cells_in_bounds(anchors, cell_size_meters, utm_bounds)
+    cells = _anchors_to_cells(anchors[keep], cell_size_meters)
+    return cells, groups[keep]
+
+
+def cell_array_to_dict(cells, groups, quad_space=False):
+    """Convert :func:`calculate_cell_array` output to a ``cells_list_dict``.
+
+    Arguments
+    ---------
+    cells : :class:`numpy.ndarray`
+        ``(N, 4)`` array of cell boundaries.
+    groups : :class:`numpy.ndarray`
+        ``(N,)`` array of `quad_space` subset ids.
+    quad_space : bool, optional
+        Whether the output should have keys ``[0, 1, 2, 3]`` (``True``) or
+        only ``0`` (``False``). Defaults to ``False``.
+
+    Returns
+    -------
+    cells_list_dict : dict of list(s) of lists
+        See :func:`calculate_analysis_grid` .
+
+    """
+    if quad_space:
+        keys = [0, 1, 2, 3]
+    else:
+        keys = [0]
+    return {key: cells[groups == key].tolist() for key in keys}
+
+
+def snapped_cell_pixels(cell_size_meters, src_transform, decimation=1):
+    """Get the pixel extent of a snapped cell.
+
+    Arguments
+    ---------
+    cell_size_meters : int or float
+        Requested cell size, as passed to :func:`calculate_analysis_grid` .
+    src_transform : :py:class:`affine.Affine`
+        North-up affine transformation of the source pixel grid.
+    decimation : int, optional
+        Integer downsampling factor. Defaults to ``1``.
+
+    Returns
+    -------
+    ``(width, height)`` tuple of ints
+        Cell extent in source pixels. Dividing by `decimation` gives the
+        `tilesize` at which :func:`cw_tiler.utils.tile_read_utm` reads the
+        cell without resampling (``decimation == 1``) or on an integer
+        window (``decimation > 1``).
+
+    """
+    if src_transform.b != 0 or src_transform.d != 0:
+        raise ValueError('Snapping requires a north-up src_transform.')
+    res = np.array([abs(src_transform.a), abs(src_transform.e)])
+    steps = np.maximum(np.round(cell_size_meters / (res * decimation)), 1)
+    return tuple(int(step) * decimation for step in steps)
+
+
+def _snapped_cell_array(utm_bounds, stride_size_meters, cell_size_meters,
+                        src_transform, decimation=1, quad_space=False):
+    """Cells aligned to the pixel grid of `src_transform`."""
+    cell_px = np.array(snapped_cell_pixels(cell_size_meters, src_transform,
+                                           decimation=decimation))
+    stride_px = np.array(snapped_cell_pixels(stride_size_meters,
+                                             src_transform,
+                                             decimation=decimation))
+    res = np.array([src_transform.a, -src_transform.e])
+    origin = np.array([src_transform.c, src_transform.f])
+    # pixel-edge coordinates, counted eastward and northward from origin.
+    lower = (np.asarray(utm_bounds[:2], dtype=np.float64) - origin) / res
+    upper = (np.asarray(utm_bounds[2:], dtype=np.float64) - origin) / res
+    axes = []
+    for dim in range(2):
+        steps = np.arange(math.ceil(lower[dim]), math.floor(upper[dim]),
+                          stride_px[dim])
+        steps = steps[steps + cell_px[dim] < upper[dim]]
+        axes.append(origin[dim] + steps * res[dim])
+    anchors, groups = _anchor_grid(axes[0], axes[1], quad_space=quad_space)
+    cells = np.hstack([anchors, anchors + cell_px * res])
+    return cells, groups
+
+
+def _cells_in_bounds(anchors, cell_size_meters, utm_bounds):
+    """Mask of anchors whose cells end strictly inside `utm_bounds`."""
+    if len(utm_bounds) == 0:
+        return np.ones(len(anchors), dtype=bool)
+    return ((anchors[:, 0] + cell_size_meters < utm_bounds[2]) &
+            (anchors[:, 1] + cell_size_meters < utm_bounds[3]))
+
+
+def _anchors_to_cells(anchors, cell_size_meters, utm_bounds=[]):
+    """Build ``(N, 4)`` cell boundaries from ``(N, 2)`` anchor points."""
+    anchors = anchors[_cells_in_bounds(anchors, cell_size_meters, utm_bounds)]
+    return np.hstack([anchors, anchors + cell_size_meters])
+
+
 def calculate_analysis_grid(utm_bounds, stride_size_meters=300,
                             cell_size_meters=400, quad_space=False,
-                            snapToGrid=False):
+                            snapToGrid=False, src_transform=None,
+                            decimation=1):
     """Wrapper for :func:`calculate_anchor_points` and :func:`calculate_cells`.
 
     Based on UTM boundaries of an image tile, stride size, and cell size,
@@ -354,8 +916,18 @@ def calculate_analysis_grid(utm_bounds, stride_size_meters=300,
         See :func:`calculate_anchor_points` . ``quad_space`` . Defaults to
         ``False`` .
     snapToGrid : bool, optional
-        .. :deprecated: 0.2.0
-            This argument is deprecated and no longer has any effect.
+        Align cells to the source pixel grid given by `src_transform`, so
+        that each cell is a whole-pixel window of the source. Stride and cell
+        size are rounded to whole multiples of `decimation` pixels; see
+        :func:`snapped_cell_pixels` for the matching `tilesize`. Only useful
+        when `utm_bounds` are in the source CRS. Defaults to ``False``.
+    src_transform : :py:class:`affine.Affine`, optional
+        North-up affine transformation of the source. If `snapToGrid` is
+        ``True`` but `src_transform` is not given, a warning is issued and
+        the grid is not snapped, as in earlier versions.
+    decimation : int, optional
+        Integer downsampling factor for `snapToGrid`. Defaults to ``1``
+        (native resolution).
 
     Returns
     -------
@@ -366,12 +938,16 @@ def calculate_analysis_grid(utm_bounds, stride_size_meters=300,
         are in UTM coordinates.
 
     """
-    anchor_point_list_dict = calculate_anchor_points(
+    if snapToGrid and src_transform is None:
+        warnings.warn('snapToGrid has no effect without src_transform; the '
+                      'grid is not snapped.')
+        snapToGrid = False
+    cells, groups = calculate_cell_array(
         utm_bounds, stride_size_meters=stride_size_meters,
-        quad_space=quad_space)
-    cells_list_dict = calculate_cells(anchor_point_list_dict, cell_size_meters,
-                                      utm_bounds=utm_bounds)
-    return cells_list_dict
+        cell_size_meters=cell_size_meters, quad_space=quad_space,
+        src_transform=src_transform if snapToGrid else None,
+        decimation=decimation)
+    return cell_array_to_dict(cells, groups, quad_space=quad_space)
 
 
 if __name__ == '__main__':
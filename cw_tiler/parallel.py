@@ -0,0 +1,230 @@
+"""cw_tiler.parallel: parallel tiling of analysis grids."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from multiprocessing import util
+import os
+import threading
+import rasterio
+from rio_tiler.errors import TileOutsideBounds
+from . import main
+from . import utils
+from .cache import VRTCache
+
+_worker_state = {}
+
+
+def tile_utm_parallel(path, cells, n_workers=None, chunksize=16,
+                      indexes=None, tilesize=256, nodata=None, alpha=None,
+                      dst_crs='epsg:4326', return_exceptions=False,
+                      mp_context=None):
+    """Tile many cells from one image file using a pool of processes.
+
+    Each worker process opens its own :py:class:`rasterio.io.DatasetReader`
+    on `path` and tiles chunks of `chunksize` cells with
+    :func:`cw_tiler.main.tile_utm_batch`. Results are yielded in the same
+    order as `cells` regardless of which worker finishes first.
+
+    Arguments
+    ---------
+    path : str
+        Path to the source imagery file. Open datasets cannot be shared
+        between processes, so a path is required.
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs`, e.g. the output of
+        :func:`cw_tiler.main.calculate_analysis_grid`. See
+        :func:`cw_tiler.main.cells_to_array`.
+    n_workers : int, optional
+        Number of worker processes. Defaults to :func:`os.cpu_count`.
+    chunksize : int, optional
+        Number of cells sent to a worker per task. Larger chunks amortize
+        inter-process overhead; smaller chunks balance load better.
+        Defaults to ``16``. At most ``2 * n_workers`` chunks are in flight
+        at once, so finished tiles do not pile up when the consumer is
+        slower than the workers.
+    indexes : tuple of ints, optional
+        Band indexes for the output. By default, extracts all bands.
+    tilesize : int, optional
+        Output image X and Y pixel extent. Defaults to ``256``.
+    nodata : int or float, optional
+        Value to use for `nodata` pixels during tiling. By default, uses
+        the existing `nodata` value in the source.
+    alpha : int, optional
+        Alpha band index for tiling. By default, uses the same band as
+        specified by the source.
+    dst_crs : str, optional
+        Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    return_exceptions : bool, optional
+        If ``True``, a :py:exc:`rio_tiler.errors.TileOutsideBounds` instance
+        is yielded in place of the tile for each cell outside of the source
+        bounds. Defaults to ``False``, in which case the first such cell
+        raises when it is reached.
+    mp_context : str, optional
+        :py:mod:`multiprocessing` start method (``"fork"``, ``"spawn"`` or
+        ``"forkserver"``). Defaults to the platform default.
+
+    Yields
+    ------
+    ``(data, mask, window, window_transform)`` tuple
+        One tuple per cell. See :func:`cw_tiler.main.tile_utm`.
+
+    """
+    if not os.path.exists(path):
+        raise ValueError('Source is not a valid path.')
+    cell_array = main.cells_to_array(cells)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    tile_kwargs = dict(indexes=indexes, tilesize=tilesize, nodata=nodata,
+                       alpha=alpha, dst_crs=dst_crs)
+
+    ctx = multiprocessing.get_context(mp_context)
+    pool = ctx.Pool(n_workers, initializer=_init_worker,
+                    initargs=(path, tile_kwargs))
+    pending = deque()
+    try:
+        for chunk in _chunks(cell_array, chunksize):
+            pending.append(pool.apply_async(_tile_chunk, (chunk,)))
+            if len(pending) < 2 * n_workers:
+                continue
+            for result in _chunk_results(pending.popleft().get(),
+                                         return_exceptions):
+                yield result
+        while pending:
+            for result in _chunk_results(pending.popleft().get(),
+                                         return_exceptions):
+                yield result
+        # let the workers exit normally so that they close their handles
+        pool.close()
+        pool.join()
+    finally:
+        pool.terminate()
+
+
+def _init_worker(path, tile_kwargs):
+    """Open a per-process dataset handle for :func:`_tile_chunk`."""
+    _worker_state['src'] = utils.SourceInfo(rasterio.open(path))
+    _worker_state['tile_kwargs'] = tile_kwargs
+    util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    """Close the worker's dataset handles when the worker process exits."""
+    info = _worker_state.pop('src', None)
+    if info is not None:
+        info.close()
+        info.src.close()
+
+
+def _tile_chunk(cell_array):
+    """Tile a chunk of cells using the worker's dataset handle."""
+    return list(main.tile_utm_batch(_worker_state['src'], cell_array,
+                                    return_exceptions=True,
+                                    **_worker_state['tile_kwargs']))
+
+
+def tile_utm_threaded(path, cells, n_workers=None, chunksize=16,
+                      indexes=None, tilesize=256, nodata=None, alpha=None,
+                      dst_crs='epsg:4326', return_exceptions=False):
+    """Tile many cells from one image file using a pool of threads.
+
+    GDAL releases the GIL while decompressing and warping, so threads can
+    decode chips concurrently without the pickling and memory costs of
+    :func:`tile_utm_parallel`, and without forking. A single
+    :py:class:`rasterio.io.DatasetReader` cannot be read from several threads
+    at once, so each thread opens its own handle on `path` and keeps its own
+    :class:`cw_tiler.cache.VRTCache`. All handles are closed when the
+    iterator is exhausted or closed.
+
+    Arguments
+    ---------
+    path : str
+        Path to the source imagery file.
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs`. See :func:`cw_tiler.main.cells_to_array`.
+    n_workers : int, optional
+        Number of threads. Defaults to :func:`os.cpu_count`.
+    chunksize : int, optional
+        Number of cells tiled per task. Defaults to ``16``. At most
+        ``2 * n_workers`` chunks are in flight at once, which bounds memory
+        use when the consumer is slower than the readers.
+    indexes : tuple of ints, optional
+        Band indexes for the output. By default, extracts all bands.
+    tilesize : int, optional
+        Output image X and Y pixel extent. Defaults to ``256``.
+    nodata : int or float, optional
+        Value to use for `nodata` pixels during tiling. By default, uses
+        the existing `nodata` value in the source.
+    alpha : int, optional
+        Alpha band index for tiling. By default, uses the same band as
+        specified by the source.
+    dst_crs : str, optional
+        Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    return_exceptions : bool, optional
+        See :func:`tile_utm_parallel`. Defaults to ``False``.
+
+    Yields
+    ------
+    ``(data, mask, window, window_transform)`` tuple
+        One tuple per cell, in the same order as `cells`. See
+        :func:`cw_tiler.main.tile_utm`.
+
+    """
+    if not os.path.exists(path):
+        raise ValueError('Source is not a valid path.')
+    cell_array = main.cells_to_array(cells)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    tile_kwargs = dict(indexes=indexes, tilesize=tilesize, nodata=nodata,
+                       alpha=alpha, dst_crs=dst_crs)
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def tile_chunk(chunk):
+        if not hasattr(local, 'src'):
+            local.src = utils.SourceInfo(rasterio.open(path))
+            local.vrt_cache = VRTCache(maxsize=1)
+            with handles_lock:
+                handles.append((local.src, local.vrt_cache))
+        return list(main.tile_utm_batch(local.src, chunk,
+                                        vrt_cache=local.vrt_cache,
+                                        return_exceptions=True,
+                                        **tile_kwargs))
+
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=n_workers)
+    try:
+        for chunk in _chunks(cell_array, chunksize):
+            pending.append(executor.submit(tile_chunk, chunk))
+            if len(pending) < 2 * n_workers:
+                continue
+            for result in _chunk_results(pending.popleft().result(),
+                                         return_exceptions):
+                yield result
+        while pending:
+            for result in _chunk_results(pending.popleft().result(),
+                                         return_exceptions):
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        for info, vrt_cache in handles:
+            vrt_cache.close()
+            info.close()
+            info.src.close()
+
+
+def _chunks(cell_array, chunksize):
+    """Split `cell_array` into consecutive chunks of `chunksize` cells."""
+    for i in range(0, len(cell_array), chunksize):
+        yield cell_array[i:i + chunksize]
+
+
+def _chunk_results(results, return_exceptions):
+    """Unpack a finished chunk, raising out-of-bounds cells if requested."""
+    for result in results:
+        if isinstance(result, TileOutsideBounds) and not return_exceptions:
+            raise result
+        yield result
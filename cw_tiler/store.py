@@ -0,0 +1,259 @@
+"""cw_tiler.store: memory-mapped chip stores for training."""
+
+import os
+import json
+import numpy as np
+from affine import Affine
+from rasterio.crs import CRS
+from rasterio.windows import Window
+from rio_tiler.errors import TileOutsideBounds
+from . import main
+from . import utils
+
+
+INDEX_DTYPE = np.dtype([('bounds', np.float64, (4,)),
+                        ('window', np.float64, (4,)),
+                        ('transform', np.float64, (6,)),
+                        ('valid', np.bool_)])
+
+
+class ChipStore(object):
+    """Chips held in one memory-mapped array with a per-chip index.
+
+    Writing each chip to its own file makes building a training set slow,
+    and every file must be decoded again when it is read. A chip store is a
+    directory holding:
+
+    ``data.npy``
+        All chips, shape ``(N, C, tilesize, tilesize)``.
+    ``mask.npy``
+        All chip masks, shape ``(N, tilesize, tilesize)``, ``uint8``.
+    ``index.npy``
+        One :data:`INDEX_DTYPE` record per chip: its bounds, its window
+        (``col_off, row_off, width, height``), its affine transform (first
+        six coefficients) and whether it has been written.
+    ``meta.json``
+        Coordinate reference system of the chips.
+
+    The ``.npy`` files are standard NumPy arrays, opened as memory maps, so
+    chips can be read by index without copying or decoding. Use
+    :meth:`create` or :func:`tile_to_store` to make a new store.
+
+    Arguments
+    ---------
+    path : str
+        Path to the store directory.
+    mode : str, optional
+        ``"r"`` to open read-only or ``"r+"`` to allow writing chips.
+        Defaults to ``"r"``.
+
+    Attributes
+    ----------
+    data : :class:`numpy.memmap`
+        Chip array of shape ``(N, C, tilesize, tilesize)``.
+    mask : :class:`numpy.memmap`
+        Mask array of shape ``(N, tilesize, tilesize)``.
+    index : :class:`numpy.memmap`
+        Record array of length ``N`` with fields ``bounds``, ``window``,
+        ``transform`` and ``valid``.
+    crs : :py:class:`rasterio.crs.CRS` or None
+        Coordinate reference system of the chips.
+
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError('mode must be "r" or "r+".')
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.crs = CRS.from_wkt(meta['crs']) if meta['crs'] else None
+        self.data = np.load(os.path.join(path, 'data.npy'), mmap_mode=mode)
+        self.mask = np.load(os.path.join(path, 'mask.npy'), mmap_mode=mode)
+        self.index = np.load(os.path.join(path, 'index.npy'), mmap_mode=mode)
+
+    @classmethod
+    def create(cls, path, n_chips, count, tilesize, dtype='uint8',
+               crs=None):
+        """Create an empty chip store, preallocating all of its arrays.
+
+        Arguments
+        ---------
+        path : str
+            Path to the store directory. It is created if needed.
+        n_chips : int
+            Number of chips.
+        count : int
+            Number of bands per chip.
+        tilesize : int
+            Chip height and width in pixels.
+        dtype : str or :class:`numpy.dtype`, optional
+            Data type of the chips. Defaults to ``"uint8"``.
+        crs : str or :py:class:`rasterio.crs.CRS`, optional
+            Coordinate reference system of the chips.
+
+        Returns
+        -------
+        :class:`ChipStore`
+            The new store, opened with mode ``"r+"``.
+
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        shape = (n_chips, tilesize, tilesize)
+        for name, arr_dtype, arr_shape in [
+                ('data', dtype, (n_chips, count, tilesize, tilesize)),
+                ('mask', np.uint8, shape),
+                ('index', INDEX_DTYPE, (n_chips,))]:
+            arr = np.lib.format.open_memmap(
+                os.path.join(path, name + '.npy'), mode='w+',
+                dtype=arr_dtype, shape=arr_shape)
+            del arr
+        crs = CRS.from_user_input(crs).to_wkt() if crs else None
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'crs': crs}, f)
+        return cls(path, mode='r+')
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """Get the ``(data, mask)`` of chip `i` as views into the store."""
+        return self.data[i], self.mask[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def bounds(self, i):
+        """Bounds ``(W, S, E, N)`` of chip `i`."""
+        return tuple(self.index['bounds'][i])
+
+    def window(self, i):
+        """Source :py:class:`rasterio.windows.Window` of chip `i`."""
+        return Window(*self.index['window'][i])
+
+    def transform(self, i):
+        """Affine transformation of chip `i`."""
+        return Affine(*self.index['transform'][i])
+
+    def write(self, i, data, mask=None, window=None, window_transform=None,
+              bounds=None):
+        """Write chip `i` and its index record.
+
+        Arguments
+        ---------
+        i : int
+            Chip position in the store.
+        data : :class:`numpy.ndarray`
+            Chip of shape ``(C, tilesize, tilesize)``.
+        mask : :class:`numpy.ndarray`, optional
+            Chip mask of shape ``(tilesize, tilesize)``. Defaults to all
+            valid (``255``).
+        window : :py:class:`rasterio.windows.Window`, optional
+            Source window of the chip.
+        window_transform : :py:class:`affine.Affine`, optional
+            Affine transformation of the chip.
+        bounds : ``(W, S, E, N)`` tuple, optional
+            Bounds of the chip.
+
+        """
+        # tiles read with ``out=`` are already in place
+        if not np.may_share_memory(self.data[i], data):
+            self.data[i] = data
+        if mask is None:
+            self.mask[i] = 255
+        elif not np.may_share_memory(self.mask[i], mask):
+            self.mask[i] = mask
+        record = self.index[i]
+        if bounds is not None:
+            record['bounds'] = bounds
+        if window is not None:
+            record['window'] = (window.col_off, window.row_off,
+                                window.width, window.height)
+        if window_transform is not None:
+            record['transform'] = tuple(window_transform)[:6]
+        record['valid'] = True
+        self.index[i] = record
+
+    def flush(self):
+        """Flush written chips to disk."""
+        if self.mode == 'r+':
+            for arr in (self.data, self.mask, self.index):
+                arr.flush()
+
+    def close(self):
+        """Flush and release the memory maps."""
+        self.flush()
+        self.data = self.mask = self.index = None
+
+
+def tile_to_store(source, cells, path, indexes=None, tilesize=256,
+                  nodata=None, alpha=None, dst_crs='epsg:4326',
+                  vrt_cache=None, overviews=False, native=False):
+    """Tile `cells` from `source` straight into a new :class:`ChipStore`.
+
+    Arguments
+    ---------
+    source : str, :py:class:`rasterio.Dataset` or :class:`cw_tiler.utils.SourceInfo`
+        Source imagery dataset to tile, or a path to it.
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries in `dst_crs`. See
+        :func:`cw_tiler.main.tile_utm_batch` .
+    path : str
+        Path to the store directory.
+    indexes : tuple of 3 ints, optional
+        Band indexes for the output. By default, extracts all of the
+        indexes from `source`.
+    tilesize : int, optional
+        Output image X and Y pixel extent. Defaults to ``256``.
+    nodata : int or float, optional
+        Value to use for `nodata` pixels during tiling. By default, uses
+        the existing `nodata` value in `source`.
+    alpha : int, optional
+        Alpha band index for tiling. By default, uses the same band as
+        specified by `source`.
+    dst_crs : str, optional
+        Coordinate reference system for output. Defaults to ``"epsg:4326"``.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache of open VRTs to read from. See
+        :func:`cw_tiler.utils.tile_read_utm` .
+    overviews : bool, optional
+        Read downsampled tiles from the best overview level of `source`.
+        See :func:`cw_tiler.utils.tile_read_utm` . Defaults to ``False``.
+    native : bool, optional
+        Read native-resolution pixels even for downsampled tiles. See
+        :func:`cw_tiler.utils.tile_read_utm` . Defaults to ``False``.
+
+    Returns
+    -------
+    :class:`ChipStore`
+        The filled store, opened with mode ``"r+"``. Chip ``k`` is cell
+        ``k`` of :func:`cw_tiler.main.cells_to_array` ``(cells)``; cells
+        outside of the source bounds are left empty with ``valid`` set to
+        ``False`` in the index.
+
+    """
+    src = utils.get_dataset(source)
+    cell_array = main.cells_to_array(cells)
+    indexes = indexes if indexes is not None else src.indexes
+    store = ChipStore.create(path, len(cell_array), len(indexes), tilesize,
+                             dtype=src.dtypes[indexes[0] - 1], crs=dst_crs)
+    store.index['bounds'] = cell_array
+    # tiles are read straight into the memory-mapped arrays
+    tiles = main.tile_utm_batch(source, cell_array, indexes=indexes,
+                                tilesize=tilesize, nodata=nodata, alpha=alpha,
+                                dst_crs=dst_crs, vrt_cache=vrt_cache,
+                                return_exceptions=True, out=store.data,
+                                out_mask=store.mask, overviews=overviews,
+                                native=native)
+    for i, tile in enumerate(tiles):
+        if isinstance(tile, TileOutsideBounds):
+            continue
+        data, mask, window, window_transform = tile
+        store.write(i, data, mask, window, window_transform)
+    store.flush()
+    return store
@@ -3,14 +3,17 @@
 
 import numpy as np
 import rasterio
+from rasterio.crs import CRS
 from rasterio.vrt import WarpedVRT
 from rasterio.enums import Resampling
 from rasterio.io import DatasetReader
 from rasterio.warp import transform_bounds
+from rasterio.enums import MaskFlags
 from rio_tiler.errors import RioTilerError
 from rasterio import windows
 from rasterio import transform
 from shapely.geometry import box
+from .cache import get_vrt_cache, get_dataset_pool, BlockCache
 
 
 def utm_getZone(longitude):
@@ -169,17 +172,41 @@ def get_utm_vrt_profile(source, crs='EPSG:3857',
 
 def tile_read_utm(source, bounds, tilesize, indexes=[1], nodata=None,
                   alpha=None, dst_crs='EPSG:3857', verbose=False,
-                  boundless=False):
+                  boundless=False, vrt_cache=None, force_warp=False,
+                  block_cache=None, overviews=False, mask=True, out=None,
+                  out_mask=None, native=False):
     """Read data and mask.
 
+    If `dst_crs` is equivalent to the CRS of `source`, every pixel of
+    `source` is valid (no nodata value, mask or alpha band) and `nodata` is
+    not given, the tile is read directly from the dataset with a windowed,
+    resampled read rather than through a
+    :py:class:`rasterio.vrt.WarpedVRT`, which is several times faster. The
+    result is then identical to the warped read. Sources with invalid
+    pixels are always warped, because GDAL's warper leaves them out of the
+    interpolation and a direct read does not, which changes both data and
+    mask well beyond the nodata edges. For direct reads, `window` is
+    relative to the source dataset rather than to a VRT, and if `bounds`
+    fall on source pixel edges (see ``snapToGrid`` in
+    :func:`cw_tiler.main.calculate_analysis_grid`), `window` is a whole-pixel
+    window, and when `tilesize` matches its size the source pixels are
+    copied without resampling.
+
+    By default, GDAL reads downsampled tiles from an overview of the source
+    by itself, if the source has any. With `overviews`, the tile is instead
+    read from the level chosen by :func:`get_overview_level` , and `window`
+    is relative to that overview. With `native`, overviews are never used.
+
     Arguments
     ---------
-    source : str or :py:class:`rasterio.io.DatasetReader`
-        input file path or :py:class:`rasterio.io.DatasetReader` object.
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`SourceInfo`
+        input file path, :py:class:`rasterio.io.DatasetReader` object, or
+        :class:`SourceInfo` describing an open dataset.
     bounds : ``(W, S, E, N)`` tuple
         bounds in `dst_crs` .
-    tilesize : int
-        Length of one edge of the output tile in pixels.
+    tilesize : int or ``(height, width)`` tuple
+        Length of one edge of the output tile in pixels, or the output
+        height and width for a rectangular tile.
     indexes : list of ints or int, optional
         Channel index(es) to output. Returns a 3D :py:class:`np.ndarray` of
         shape (C, Y, X) if `indexes` is a list, or a 2D array if `indexes` is
@@ -197,6 +224,54 @@ def tile_read_utm(source, bounds, tilesize, indexes=[1], nodata=None,
         Verbose text output. Defaults to ``False``.
     boundless : bool, optional
         This argument is deprecated and should never be used.
+    vrt_cache : :class:`cw_tiler.cache.VRTCache` or bool, optional
+        Cache to draw the :py:class:`rasterio.vrt.WarpedVRT` from. Defaults to
+        ``None``, which uses the module-level cache from
+        :func:`cw_tiler.cache.get_vrt_cache`. Pass ``False`` to build and
+        close a fresh VRT for this read only.
+    force_warp : bool, optional
+        Always read through a :py:class:`rasterio.vrt.WarpedVRT`, even if
+        `dst_crs` matches the source CRS. Defaults to ``False``.
+    block_cache : :class:`cw_tiler.cache.BlockCache`, optional
+        Cache of decoded source blocks for direct (no-warp) reads. If
+        provided, the source pixels under the tile are assembled from the
+        cache, decoding only blocks not already in memory, and read from an
+        in-memory copy on the same pixel grid, so overlapping tiles reuse
+        decoded blocks and the result is identical to an uncached read.
+        Warped reads do not use it. Defaults to ``None`` (read the source
+        directly).
+    overviews : bool, optional
+        Read from the overview level given by :func:`get_overview_level`
+        for the output resolution. Overview levels are opened from the
+        source path, so they are only used when `source` is a path or a
+        :class:`SourceInfo` whose dataset is not in memory; other sources
+        are read as by default. Defaults to ``False``.
+    native : bool, optional
+        Always read native-resolution pixels, which is slower for
+        downsampled tiles. Paths and :class:`SourceInfo` sources are read
+        from a handle opened with overviews disabled. Downsampled tiles
+        from other datasets with overviews are read from an in-memory copy
+        of the native pixels under the tile, which is much slower. Cannot
+        be combined with `overviews`. Defaults to ``False``.
+    mask : bool or str, optional
+        How to compute `mask`. If ``True``, it is derived in the same pass
+        as `data` wherever that gives the same result: from `data` when
+        `nodata` is set, from the alpha band read along with the data bands,
+        or as a constant when the dataset has no mask. Otherwise the mask
+        band is read with bilinear resampling. ``'nearest'`` reads the mask
+        band with nearest-neighbour resampling instead, which is cheaper and
+        gives only ``0`` and ``255``. ``False`` skips the mask and returns
+        ``None`` in its place. Defaults to ``True``.
+    out : :class:`numpy.ndarray`, optional
+        Array of shape ``(C, Y, X)`` to read the data into, e.g. a slot of a
+        preallocated batch array or of a :class:`cw_tiler.store.ChipStore` .
+        GDAL resamples straight into its dtype: an integer `out` gets the
+        same values as a read without it, but a floating-point `out` of an
+        integer dataset gets the unrounded resampled values, which differ
+        from them by up to ``0.5`` . By default, a new array is allocated.
+    out_mask : :class:`numpy.ndarray`, optional
+        Array of shape ``(Y, X)`` to write the mask into. By default, a new
+        array is allocated.
 
     Returns
     -------
@@ -206,7 +281,8 @@ def tile_read_utm(source, bounds, tilesize, indexes=[1], nodata=None,
     mask : :py:class:`np.ndarray`
         int mask indicating which pixels contain information and which are
         `nodata`. Pixels containing data have value ``255``, `nodata`
-        pixels have value ``0``.
+        pixels have value ``0``. ``None`` if `mask` is ``False``. `data`
+        and `mask` are `out` and `out_mask` if those were given.
     window : :py:class:`rasterio.windows.Window`
         :py:class:`rasterio.windows.Window` object indicating the raster
         location of the dataset subregion being returned in `data`.
@@ -216,54 +292,339 @@ def tile_read_utm(source, bounds, tilesize, indexes=[1], nodata=None,
 
 
     """
-    w, s, e, n = bounds
     if alpha is not None and nodata is not None:
         raise RioTilerError('cannot pass alpha and nodata option')
+    if overviews and native:
+        raise ValueError('cannot pass overviews and native option')
 
     if isinstance(indexes, int):
         indexes = [indexes]
-    out_shape = (len(indexes), tilesize, tilesize)
+    if isinstance(tilesize, (int, np.integer)):
+        tilesize = (tilesize, tilesize)
+    out_shape = (len(indexes),) + tuple(tilesize)
+    if out is not None and out.shape != out_shape:
+        raise ValueError('out has shape {}, expected {}.'.format(
+            out.shape, out_shape))
+    if out_mask is not None and out_mask.shape != out_shape[1:]:
+        raise ValueError('out_mask has shape {}, expected {}.'.format(
+            out_mask.shape, out_shape[1:]))
     if verbose:
         print(dst_crs)
     vrt_params = dict(crs=dst_crs, resampling=Resampling.bilinear,
                       src_nodata=nodata, dst_nodata=nodata)
 
-    if not isinstance(source, DatasetReader):
-        src = rasterio.open(source)
+    src, level, native_copy = _select_dataset(source, bounds, tilesize,
+                                              dst_crs, overviews, native)
+    if verbose:
+        print('overview level: {}'.format(level))
+
+    if (not force_warp and crs_equivalent(src.crs, dst_crs) and
+            _direct_read_exact(src, nodata)):
+        if block_cache is None and native_copy and _is_downsampled(
+                src.window(*bounds), out_shape):
+            # block reads are always at native resolution
+            block_cache = BlockCache()
+        if block_cache is not None:
+            return _read_cached_tile(src, bounds, tilesize, indexes, nodata,
+                                     alpha, out_shape, block_cache,
+                                     verbose=verbose, mask=mask, out=out,
+                                     out_mask=out_mask)
+        return _read_vrt_tile(src, bounds, tilesize, indexes, nodata, alpha,
+                              out_shape, verbose=verbose, snap=True,
+                              mask=mask, out=out, out_mask=out_mask)
+    if vrt_cache is False:
+        with WarpedVRT(src, **vrt_params) as vrt:
+            if native_copy and _is_downsampled(vrt.window(*bounds),
+                                               out_shape):
+                return _read_warped_copy(src, vrt, bounds, tilesize,
+                                         indexes, nodata, alpha, out_shape,
+                                         verbose=verbose, mask=mask, out=out,
+                                         out_mask=out_mask)
+            return _read_vrt_tile(vrt, bounds, tilesize, indexes, nodata,
+                                  alpha, out_shape, verbose=verbose,
+                                  mask=mask, out=out, out_mask=out_mask)
+    if vrt_cache is None or vrt_cache is True:
+        vrt_cache = get_vrt_cache()
+    vrt = vrt_cache.get(src, dst_crs, nodata=nodata,
+                        resampling=Resampling.bilinear)
+    if native_copy and _is_downsampled(vrt.window(*bounds), out_shape):
+        return _read_warped_copy(src, vrt, bounds, tilesize, indexes, nodata,
+                                 alpha, out_shape, verbose=verbose,
+                                 mask=mask, out=out, out_mask=out_mask)
+    return _read_vrt_tile(vrt, bounds, tilesize, indexes, nodata, alpha,
+                          out_shape, verbose=verbose, mask=mask, out=out,
+                          out_mask=out_mask)
+
+
+def _select_dataset(source, bounds, tilesize, dst_crs, overviews, native):
+    """Choose the dataset to read a tile of `source` from.
+
+    Returns the dataset, the overview level it was opened at (``None`` if
+    it is the source itself or a native-resolution handle), and whether
+    native pixels must be read from an in-memory copy because `source` has
+    overviews but cannot be reopened without them.
+    """
+    src = get_dataset(source)
+    if not (overviews or native):
+        # GDAL picks an overview itself when downsampling
+        return src, None, False
+    factors = (source.overviews if isinstance(source, SourceInfo)
+               else src.overviews(1))
+    if not factors:
+        return src, None, False
+    if not _can_reopen(source):
+        return src, None, native
+    if native:
+        # disable GDAL's own overview selection, in direct and warped reads
+        return get_overview_dataset(source, 'NONE'), None, False
+    level = get_overview_level(source, bounds, tilesize, dst_crs)
+    if level is None:
+        return src, None, False
+    return get_overview_dataset(source, level), level, False
+
+
+def _direct_read_exact(src, nodata):
+    """Whether a direct read gives the same tile as a VRT of `src`.
+
+    GDAL's warper leaves nodata and masked pixels out of the interpolation
+    and derives the output mask from the warped pixels, while a direct read
+    averages them in and resamples the mask band on its own. The results
+    therefore only agree if every source pixel is valid.
+    """
+    return nodata is None and all(flags == [MaskFlags.all_valid]
+                                  for flags in src.mask_flag_enums)
+
+
+def _is_downsampled(window, out_shape):
+    """Whether reading `window` into `out_shape` reduces the resolution."""
+    return (window.height > out_shape[1] * (1 + 1e-6) or
+            window.width > out_shape[2] * (1 + 1e-6))
+
+
+def _native_copy(src, window, pad, mask=True, block_cache=None):
+    """Copy the source pixels under `window` into an in-memory dataset.
+
+    The copy is read at native resolution, from `block_cache` if given,
+    padded by `pad` pixels and clipped to the dataset (so that edge pixels
+    are clamped the same way as in the source). Masks and alpha bands are
+    kept. Returns the open copy and its window in `src`; the copy is
+    ``None`` if `window` misses the dataset.
+    """
+    col_off = max(int(np.floor(window.col_off)) - pad, 0)
+    row_off = max(int(np.floor(window.row_off)) - pad, 0)
+    read_window = windows.Window(
+        col_off, row_off,
+        min(int(np.ceil(window.col_off + window.width)) + pad,
+            src.width) - col_off,
+        min(int(np.ceil(window.row_off + window.height)) + pad,
+            src.height) - row_off)
+    if read_window.width <= 0 or read_window.height <= 0:
+        return None, read_window
+    profile = dict(driver='MEM', width=read_window.width,
+                   height=read_window.height, count=src.count,
+                   dtype=src.dtypes[0], crs=src.crs, nodata=src.nodata,
+                   transform=windows.transform(read_window, src.transform))
+    mem = rasterio.open('', 'w+', **profile)
+    if block_cache is not None:
+        mem.write(block_cache.read(src, read_window))
     else:
-        src = source
-    with WarpedVRT(src, **vrt_params) as vrt:
-        window = vrt.window(w, s, e, n, precision=21)
-        if verbose:
-            print(window)
-        window_transform = transform.from_bounds(w, s, e, n,
-                                                 tilesize, tilesize)
+        mem.write(src.read(window=read_window))
+    mask_flags = src.mask_flag_enums[0]
+    if MaskFlags.alpha in mask_flags:
+        mem.colorinterp = src.colorinterp
+    elif mask and MaskFlags.per_dataset in mask_flags:
+        if block_cache is not None:
+            mem.write_mask(block_cache.read(src, read_window, masks=True)[0])
+        else:
+            mem.write_mask(src.read_masks(1, window=read_window))
+    return mem, read_window
+
 
+def _read_warped_copy(src, vrt, bounds, tilesize, indexes, nodata, alpha,
+                      out_shape, verbose=False, mask=True, out=None,
+                      out_mask=None):
+    """Read a downsampled tile at native resolution through a warped copy.
+
+    A :py:class:`rasterio.vrt.WarpedVRT` uses the overviews of its source
+    when read at a reduced resolution. For a dataset that cannot be
+    reopened without them, the source pixels under the tile are copied at
+    native resolution and warped onto the grid of `vrt`, so `window` is
+    still relative to `vrt`.
+    """
+    window = vrt.window(*bounds)
+    scale = max(window.width / out_shape[2], window.height / out_shape[1])
+    src_window = windows.from_bounds(
+        *transform_bounds(vrt.crs, src.crs, *bounds, densify_pts=21),
+        transform=src.transform)
+    mem, _ = _native_copy(src, src_window, int(np.ceil(2 * scale)) + 2,
+                          mask=mask)
+    if mem is None:
+        return _read_vrt_tile(vrt, bounds, tilesize, indexes, nodata, alpha,
+                              out_shape, verbose=verbose, mask=mask, out=out,
+                              out_mask=out_mask)
+    with mem, WarpedVRT(mem, crs=vrt.crs, transform=vrt.transform,
+                        width=vrt.width, height=vrt.height,
+                        resampling=Resampling.bilinear, src_nodata=nodata,
+                        dst_nodata=nodata) as copy_vrt:
+        return _read_vrt_tile(copy_vrt, bounds, tilesize, indexes, nodata,
+                              alpha, out_shape, verbose=verbose, mask=mask,
+                              out=out, out_mask=out_mask)
+
+
+def _read_vrt_tile(vrt, bounds, tilesize, indexes, nodata, alpha, out_shape,
+                   verbose=False, snap=False, mask=True, out=None,
+                   out_mask=None):
+    """Read a tile's data and mask from an open VRT or dataset.
+
+    If `snap` is ``True`` and the window for `bounds` falls on whole pixels,
+    the window is rounded to integers, and if it also matches `out_shape`
+    the read is a plain copy of source pixels with no resampling. See
+    :func:`tile_read_utm` for `mask`, `out` and `out_mask`.
+    """
+    w, s, e, n = bounds
+    window = vrt.window(w, s, e, n, precision=21)
+    resampling = Resampling.bilinear
+    if snap:
+        int_window = _integer_window(window)
+        if int_window is not None:
+            window = int_window
+            if (window.height, window.width) == out_shape[1:]:
+                resampling = Resampling.nearest
+    if verbose:
+        print(window)
+    window_transform = transform.from_bounds(w, s, e, n,
+                                             out_shape[2], out_shape[1])
+
+    read_indexes = list(indexes)
+    if mask and nodata is None and alpha is not None and out is None:
+        # warp the alpha band in the same read as the data
+        read_indexes.append(alpha)
+    if out is None:
         data = vrt.read(window=window,
-                        resampling=Resampling.bilinear,
-                        out_shape=out_shape,
-                        indexes=indexes)
-        if verbose:
-            print(bounds)
-            print(window)
-            print(out_shape)
-            print(indexes)
-            print(boundless)
-            print(window_transform)
-
-        if nodata is not None:
-            mask = np.all(data != nodata, axis=0).astype(np.uint8) * 255
-        elif alpha is not None:
-            mask = vrt.read(alpha, window=window,
-                            out_shape=(tilesize, tilesize),
-                            resampling=Resampling.bilinear)
+                        resampling=resampling,
+                        out_shape=(len(read_indexes),) + tuple(out_shape[1:]),
+                        indexes=read_indexes)
+    else:
+        data = vrt.read(window=window, resampling=resampling,
+                        indexes=read_indexes, out=out)
+    if verbose:
+        print(bounds)
+        print(window)
+        print(out_shape)
+        print(indexes)
+        print(window_transform)
+
+    if not mask:
+        return data, None, window, window_transform
+    if nodata is not None:
+        valid = np.all(data != nodata, axis=0)
+        if out_mask is None:
+            mask = valid.astype(np.uint8) * 255
+        else:
+            mask = np.multiply(valid, 255, out=out_mask, casting='unsafe')
+    elif alpha is not None and len(read_indexes) > len(indexes):
+        data, mask = data[:-1], data[-1]
+        if out_mask is not None:
+            out_mask[...] = mask
+            mask = out_mask
+    elif alpha is not None:
+        if out_mask is None:
+            mask = vrt.read(alpha, window=window, resampling=resampling,
+                            out_shape=out_shape[1:])
+        else:
+            mask = vrt.read(alpha, window=window, resampling=resampling,
+                            out=out_mask)
+    elif vrt.mask_flag_enums[0] == [MaskFlags.all_valid]:
+        if out_mask is None:
+            mask = np.full(out_shape[1:], 255, dtype=np.uint8)
         else:
+            out_mask.fill(255)
+            mask = out_mask
+    else:
+        if mask == 'nearest':
+            resampling = Resampling.nearest
+        if out_mask is None:
             mask = vrt.read_masks(1, window=window,
-                                  out_shape=(tilesize, tilesize),
-                                  resampling=Resampling.bilinear)
+                                  out_shape=out_shape[1:],
+                                  resampling=resampling)
+        else:
+            mask = vrt.read_masks(1, window=window, resampling=resampling,
+                                  out=out_mask)
     return data, mask, window, window_transform
 
 
+def _read_cached_tile(src, bounds, tilesize, indexes, nodata, alpha,
+                      out_shape, block_cache, verbose=False, mask=True,
+                      out=None, out_mask=None):
+    """Read a tile from a copy of the source pixels held in a block cache.
+
+    The source pixels under the tile, padded by the resampling kernel, are
+    assembled from `block_cache` into an in-memory dataset on the source
+    pixel grid, which is then read exactly as the source would be.
+    """
+    window = windows.from_bounds(*bounds, transform=src.transform)
+    # pad by the bilinear kernel radius, scaled up when downsampling.
+    scale = max(window.width / out_shape[2], window.height / out_shape[1],
+                1.0)
+    mem, read_window = _native_copy(src, window, int(np.ceil(2 * scale)) + 2,
+                                    mask=mask, block_cache=block_cache)
+    if mem is None:
+        return _read_vrt_tile(src, bounds, tilesize, indexes, nodata, alpha,
+                              out_shape, verbose=verbose, snap=True,
+                              mask=mask, out=out, out_mask=out_mask)
+    col_off, row_off = read_window.col_off, read_window.row_off
+    with mem:
+        data, mask, mem_window, window_transform = _read_vrt_tile(
+            mem, bounds, tilesize, indexes, nodata, alpha, out_shape,
+            verbose=verbose, snap=True, mask=mask, out=out,
+            out_mask=out_mask)
+    window = windows.Window(mem_window.col_off + col_off,
+                            mem_window.row_off + row_off,
+                            mem_window.width, mem_window.height)
+    return data, mask, window, window_transform
+
+
+def _integer_window(window, tolerance=1e-6):
+    """Round `window` to whole pixels if it is within `tolerance` of them."""
+    values = np.array([window.col_off, window.row_off,
+                       window.width, window.height])
+    rounded = np.round(values)
+    if np.all(np.abs(values - rounded) <= tolerance):
+        return windows.Window(*[int(v) for v in rounded])
+    return None
+
+
+_crs_equivalence = {}
+_dataset_bounds = {}
+
+
+def crs_equivalent(src_crs, dst_crs):
+    """Check whether two coordinate reference systems are equivalent.
+
+    Results are memoized, since the same pair is compared for every tile.
+
+    Arguments
+    ---------
+    src_crs : :py:class:`rasterio.crs.CRS`
+        Coordinate reference system of a dataset.
+    dst_crs : str or :py:class:`rasterio.crs.CRS`
+        Coordinate reference system to compare with, e.g. a proj4 string
+        from :func:`calculate_UTM_crs` .
+
+    Returns
+    -------
+    bool
+        ``True`` if `src_crs` and `dst_crs` describe the same projection.
+
+    """
+    key = (str(src_crs), str(dst_crs))
+    if key not in _crs_equivalence:
+        _crs_equivalence[key] = (src_crs is not None and
+                                 CRS.from_user_input(src_crs) ==
+                                 CRS.from_user_input(dst_crs))
+    return _crs_equivalence[key]
+
+
 def tile_exists_utm(boundsSrc, boundsTile):
     """Check if suggested tile is within bounds.
 
@@ -292,10 +653,11 @@ def get_wgs84_bounds(source):
 
     Arguments
     ---------
-    source : str or :py:class:`rasterio.io.DatasetReader`
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`SourceInfo`
         Source dataset to get bounds transformation for. Can either be a string
-        path to a dataset file or an opened
-        :py:class:`rasterio.io.DatasetReader`.
+        path to a dataset file, an opened
+        :py:class:`rasterio.io.DatasetReader`, or a :class:`SourceInfo`, in
+        which case the cached bounds are returned.
 
     Returns
     -------
@@ -303,10 +665,9 @@ def get_wgs84_bounds(source):
         Bounds tuple for `source` in wgs84 crs with shape ``(W, S, E, N)``.
 
     """
-    if isinstance(source, DatasetReader):
-        src = source
-    else:
-        src = rasterio.open(source)
+    if isinstance(source, SourceInfo):
+        return source.wgs84_bounds
+    src = get_dataset(source)
     wgs_bounds = transform_bounds(*[src.crs, 'epsg:4326'] +
                                   list(src.bounds), densify_pts=21)
     return wgs_bounds
@@ -317,9 +678,11 @@ def get_utm_bounds(source, utm_EPSG):
 
     Arguments
     ---------
-    source : str or :py:class:`rasterio.io.DatasetReader`
-        Source dataset. Can either be a string path to a dataset GeoTIFF or
-        a :py:class:`rasterio.io.DatasetReader` object.
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`SourceInfo`
+        Source dataset. Can either be a string path to a dataset GeoTIFF,
+        a :py:class:`rasterio.io.DatasetReader` object, or a
+        :class:`SourceInfo`, in which case the transformed bounds are
+        memoized.
     utm_EPSG : str
         :py:class:`rasterio.crs.CRS` string indicating the UTM crs to transform
         into.
@@ -331,10 +694,264 @@ def get_utm_bounds(source, utm_EPSG):
         ``(W, S, E, N)``.
 
     """
-    if isinstance(source, DatasetReader):
-        src = source
-    else:
-        src = rasterio.open(source)
+    if isinstance(source, SourceInfo):
+        return source.bounds_in(utm_EPSG)
+    src = get_dataset(source)
     utm_bounds = transform_bounds(*[src.crs, utm_EPSG] + list(src.bounds),
                                   densify_pts=21)
     return utm_bounds
+
+
+def get_overview_level(source, bounds, tilesize, dst_crs='EPSG:3857'):
+    """Choose the overview level to read a tile from.
+
+    The level chosen is the coarsest overview that is still at least as
+    fine as the output, i.e. whose decimation factor does not exceed the
+    number of source pixels per output pixel.
+
+    Arguments
+    ---------
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`SourceInfo`
+        The source dataset.
+    bounds : ``(W, S, E, N)`` tuple
+        Tile bounds in `dst_crs` .
+    tilesize : int or ``(height, width)`` tuple
+        Output tile size in pixels.
+    dst_crs : str, optional
+        Coordinate reference system of `bounds`. Defaults to
+        ``"EPSG:3857"`` (Web Mercator).
+
+    Returns
+    -------
+    int or None
+        Index into the dataset's overview list, as accepted by the
+        ``overview_level`` option of :py:func:`rasterio.open`, or ``None``
+        if the tile should be read at native resolution.
+
+    """
+    if isinstance(source, SourceInfo):
+        factors = source.overviews
+    else:
+        factors = get_dataset(source).overviews(1)
+    if not factors:
+        return None
+    decimation = _decimation(source, bounds, tilesize, dst_crs)
+    level = None
+    for i, factor in enumerate(factors):
+        if factor <= decimation * (1 + 1e-6):
+            level = i
+    return level
+
+
+def _decimation(source, bounds, tilesize, dst_crs):
+    """Number of source pixels per output pixel for a tile.
+
+    In another CRS, the source pixel size is taken as the mean over the
+    dataset, computed once per dataset and CRS, rather than transforming
+    every tile's bounds.
+    """
+    if isinstance(tilesize, (int, np.integer)):
+        tilesize = (tilesize, tilesize)
+    src = get_dataset(source)
+    w, s, e, n = bounds
+    if crs_equivalent(src.crs, dst_crs):
+        res_x, res_y = abs(src.transform.a), abs(src.transform.e)
+    else:
+        if isinstance(source, SourceInfo):
+            src_bounds = source.bounds_in(dst_crs)
+        else:
+            key = (src.name, src.shape, tuple(src.transform), str(src.crs),
+                   str(dst_crs))
+            if key not in _dataset_bounds:
+                _dataset_bounds[key] = transform_bounds(
+                    *[src.crs, dst_crs] + list(src.bounds), densify_pts=21)
+            src_bounds = _dataset_bounds[key]
+        res_x = (src_bounds[2] - src_bounds[0]) / src.width
+        res_y = (src_bounds[3] - src_bounds[1]) / src.height
+    return min((n - s) / res_y / tilesize[0], (e - w) / res_x / tilesize[1])
+
+
+def _can_reopen(source):
+    """Whether overview levels of `source` can be opened from its path.
+
+    An open dataset may have been opened with options or credentials that
+    are lost when it is reopened by name, and its handle may be private to
+    the caller's thread, so only paths and :class:`SourceInfo` objects
+    backed by a file are reopened.
+    """
+    if isinstance(source, SourceInfo):
+        return source.src.driver != 'MEM'
+    return not isinstance(source, DatasetReader)
+
+
+def get_overview_dataset(source, level):
+    """Get an open dataset for one overview level of `source`.
+
+    Arguments
+    ---------
+    source : str or :class:`SourceInfo`
+        Path to the source dataset, or a :class:`SourceInfo` describing a
+        dataset opened from a file.
+    level : int or ``'NONE'``
+        Overview level index, or ``'NONE'`` for the full-resolution dataset
+        with overviews disabled.
+
+    Returns
+    -------
+    :py:class:`rasterio.io.DatasetReader`
+        The dataset, memoized on a :class:`SourceInfo` (and closed by
+        :meth:`SourceInfo.close`) or otherwise taken from the module-level
+        :class:`cw_tiler.cache.DatasetPool` , which keeps separate handles
+        for each thread.
+
+    """
+    if isinstance(source, SourceInfo):
+        return source.overview(level)
+    if isinstance(source, DatasetReader):
+        raise ValueError('Overviews can only be opened from a path or a '
+                         'SourceInfo.')
+    return get_dataset_pool().get(source, overview_level=level)
+
+
+def get_dataset(source):
+    """Get an open :py:class:`rasterio.io.DatasetReader` for `source`.
+
+    Arguments
+    ---------
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`SourceInfo`
+        A path to a dataset, an open dataset, or a :class:`SourceInfo`.
+
+    Returns
+    -------
+    src : :py:class:`rasterio.io.DatasetReader`
+        `source` itself if it is already open, the dataset described by a
+        :class:`SourceInfo`, or for a path, a dataset from the module-level
+        :class:`cw_tiler.cache.DatasetPool` private to the calling thread.
+        Pooled datasets are closed by the pool; callers should not close
+        them.
+
+    """
+    if isinstance(source, SourceInfo):
+        return source.src
+    if isinstance(source, DatasetReader):
+        return source
+    return get_dataset_pool().get(source)
+
+
+class SourceInfo(object):
+    """Per-dataset geometry computed once and reused for every chip.
+
+    Tiling many chips from one dataset otherwise repeats the same
+    :py:func:`rasterio.warp.transform_bounds` and UTM zone calculations for
+    every chip. A :class:`SourceInfo` can be passed anywhere a
+    :py:class:`rasterio.io.DatasetReader` is accepted by :mod:`cw_tiler.main`
+    and :mod:`cw_tiler.utils`.
+
+    `src` and the datasets opened by :meth:`overview` are single
+    :py:class:`rasterio.io.DatasetReader` handles, which must not be read
+    from two threads at once. Use one :class:`SourceInfo` per thread, as
+    :func:`cw_tiler.parallel.tile_utm_threaded` does.
+
+    Arguments
+    ---------
+    source : str or :py:class:`rasterio.io.DatasetReader`
+        Path to a dataset, or an open dataset. A path is opened with a
+        handle owned by the :class:`SourceInfo` rather than taken from the
+        dataset pool, so it stays open until :meth:`close` .
+    utm_crs : str, optional
+        UTM coordinate reference system for the dataset. If not provided,
+        this is calculated with :func:`calculate_UTM_crs` .
+
+    Attributes
+    ----------
+    src : :py:class:`rasterio.io.DatasetReader`
+        The open dataset.
+    crs : :py:class:`rasterio.crs.CRS`
+        Native coordinate reference system of `src`.
+    transform : :py:class:`affine.Affine`
+        Native affine transformation of `src`.
+    bounds : tuple
+        Native ``(W, S, E, N)`` bounds of `src`.
+    wgs84_bounds : tuple
+        ``(W, S, E, N)`` bounds in WGS84.
+    utm_crs : str
+        UTM coordinate reference system.
+    utm_bounds : tuple
+        ``(W, S, E, N)`` bounds in `utm_crs`.
+    dtype : str
+        Data type of the first band.
+    block_shape : tuple of 2 ints
+        ``(rows, cols)`` internal block shape of the first band.
+    overviews : list of ints
+        Overview decimation factors of the first band.
+
+    """
+
+    def __init__(self, source, utm_crs=None):
+        self._owns_src = not isinstance(source, DatasetReader)
+        self.src = rasterio.open(source) if self._owns_src else source
+        self.crs = self.src.crs
+        self.transform = self.src.transform
+        self.bounds = tuple(self.src.bounds)
+        self.dtype = self.src.dtypes[0]
+        self.block_shape = tuple(self.src.block_shapes[0])
+        self.overviews = self.src.overviews(1)
+        self._bounds = {}
+        self._overview_datasets = {}
+        self.wgs84_bounds = self.bounds_in('epsg:4326')
+        if not utm_crs:
+            utm_crs = calculate_UTM_crs(self.wgs84_bounds)
+        self.utm_crs = utm_crs
+        self.utm_bounds = self.bounds_in(utm_crs)
+
+    def bounds_in(self, dst_crs):
+        """Get the dataset bounds in `dst_crs`, memoized per CRS.
+
+        Arguments
+        ---------
+        dst_crs : str or :py:class:`rasterio.crs.CRS`
+            Destination coordinate reference system.
+
+        Returns
+        -------
+        tuple
+            ``(W, S, E, N)`` bounds in `dst_crs`.
+
+        """
+        key = str(dst_crs)
+        if key not in self._bounds:
+            self._bounds[key] = transform_bounds(
+                *[self.crs, dst_crs] + list(self.bounds), densify_pts=21)
+        return self._bounds[key]
+
+    def overview(self, level):
+        """Get a dataset for one overview level, opened once per level.
+
+        Arguments
+        ---------
+        level : int or ``'NONE'``
+            Overview level index, or ``'NONE'`` for the full-resolution
+            dataset with overviews disabled.
+
+        Returns
+        -------
+        :py:class:`rasterio.io.DatasetReader`
+            An open dataset owned by this :class:`SourceInfo` .
+
+        """
+        if level not in self._overview_datasets:
+            self._overview_datasets[level] = rasterio.open(
+                self.src.name, overview_level=level)
+        return self._overview_datasets[level]
+
+    def close(self):
+        """Close the overview datasets opened by :meth:`overview`.
+
+        `src` is also closed if it was opened from a path, and left open
+        otherwise.
+        """
+        for dataset in self._overview_datasets.values():
+            dataset.close()
+        self._overview_datasets.clear()
+        if self._owns_src:
+            self.src.close()
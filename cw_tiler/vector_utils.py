@@ -1,14 +1,28 @@
+import shapely
 from shapely import geometry
 from shapely.geometry import box
 import geopandas as gpd
 from rasterio import features
 from rasterio import Affine
+from rasterio.warp import transform_bounds
+import pyproj
+import pyogrio
+import os
+import json
+import hashlib
+import struct
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
+import pandas as pd
+from .main import cells_to_array
+from .utils import get_wgs84_bounds
 # Note, for mac osx compatability import something from shapely.geometry before
 # importing fiona or geopandas: https://github.com/Toblerity/Shapely/issues/553
 
 
-def read_vector_file(geoFileName):
+def read_vector_file(geoFileName, bbox=None):
     """Read Fiona-Supported Files into GeoPandas GeoDataFrame.
 
     Warning
@@ -17,14 +31,110 @@ def read_vector_file(geoFileName):
     cannot read. ``try/except`` the :py:exc:`Fiona.errors.DriverError` or
     :py:exc:`Fiona._err.CPLE_OpenFailedError` if you must use this.
 
+    Arguments
+    ---------
+    geoFileName : str
+        Path to the vector file.
+    bbox : list-like of shape ``(W, S, E, N)``, optional
+        Only read features that intersect these WGS84 bounds, e.g. from
+        :func:`cw_tiler.utils.get_wgs84_bounds` . The filter is applied by
+        the file reader, so features outside of it are never loaded.
+        Defaults to ``None`` (read all features).
+
+    """
+
+    if bbox is None:
+        return gpd.read_file(geoFileName)
+    return gpd.read_file(geoFileName, bbox=_file_bbox(geoFileName, bbox))
+
+
+def read_vector_file_chunks(geoFileName, bbox=None, chunksize=50000):
+    """Read a vector file in chunks of at most `chunksize` features.
+
+    With :py:mod:`pyarrow` installed, chunks are streamed from a single open
+    reader, so only one chunk is held in memory at a time. Otherwise, the
+    (filtered) features are read at once and yielded in chunks.
+
+    Arguments
+    ---------
+    geoFileName : str
+        Path to the vector file.
+    bbox : list-like of shape ``(W, S, E, N)``, optional
+        Only read features that intersect these WGS84 bounds. See
+        :func:`read_vector_file` .
+    chunksize : int, optional
+        Maximum number of features per chunk. Defaults to ``50000``.
+
+    Yields
+    ------
+    :py:class:`geopandas.GeoDataFrame`
+        Consecutive chunks of the (filtered) features.
+
+    """
+    if bbox is not None:
+        bbox = _file_bbox(geoFileName, bbox)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        gdf = gpd.read_file(geoFileName, bbox=bbox)
+        for start in range(0, len(gdf), chunksize):
+            yield gdf.iloc[start:start + chunksize]
+        return
+    with pyogrio.raw.open_arrow(geoFileName, bbox=bbox, batch_size=chunksize,
+                                use_pyarrow=True) as (meta, reader):
+        geometry_name = meta['geometry_name'] or 'wkb_geometry'
+        for batch in reader:
+            if not batch.num_rows:
+                continue
+            df = batch.to_pandas()
+            geometry = shapely.from_wkb(df.pop(geometry_name).values)
+            yield gpd.GeoDataFrame(df, geometry=geometry, crs=meta['crs'])
+
+
+def read_vector_file_aoi(geoFileName, source):
+    """Read the features of a vector file that fall within a raster.
+
+    Features are filtered by the WGS84 bounds of `source` in the file
+    reader, so memory use depends on the number of features inside the
+    raster footprint rather than on the file size. To process them without
+    holding all of them at once, use :func:`read_vector_file_chunks` with
+    the bounds from :func:`cw_tiler.utils.get_wgs84_bounds` .
+
+    Arguments
+    ---------
+    geoFileName : str
+        Path to the vector file.
+    source : str, :py:class:`rasterio.io.DatasetReader` or :class:`cw_tiler.utils.SourceInfo`
+        Raster whose footprint to read features for.
+
+    Returns
+    -------
+    gdf : :py:class:`geopandas.GeoDataFrame`
+        Features of `geoFileName` that intersect the bounds of `source`,
+        in the CRS of the file.
+
     """
+    return read_vector_file(geoFileName, bbox=get_wgs84_bounds(source))
 
-    return gpd.read_file(geoFileName)
 
+def _file_bbox(geoFileName, bbox):
+    """Transform WGS84 `bbox` into the CRS of a vector file."""
+    crs = pyogrio.read_info(geoFileName)['crs']
+    if crs is None:
+        return tuple(bbox)
+    return transform_bounds('EPSG:4326', crs, *bbox, densify_pts=21)
 
-def transformToUTM(gdf, utm_crs, estimate=True, calculate_sindex=True):
+
+def transformToUTM(gdf, utm_crs, estimate=True, calculate_sindex=True,
+                   n_workers=None, chunksize=250000):
     """Transform GeoDataFrame to UTM coordinate reference system.
 
+    Large inputs are transformed in chunks of `chunksize` coordinates on
+    `n_workers` threads. PROJ releases the GIL while transforming, so the
+    chunks run in parallel without copying coordinates to other processes.
+    Each point is transformed on its own, so the result is identical to
+    :py:meth:`geopandas.GeoDataFrame.to_crs` .
+
     Arguments
     ---------
     gdf : :py:class:`geopandas.GeoDataFrame`
@@ -37,6 +147,13 @@ def transformToUTM(gdf, utm_crs, estimate=True, calculate_sindex=True):
     calculate_sindex : bool, optional
         .. deprecated:: 0.2.0
             This argument is no longer used.
+    n_workers : int, optional
+        Number of threads. Defaults to the number of CPUs. With ``1``, or
+        with at most `chunksize` coordinates in `gdf`, the frame is
+        transformed in one :py:meth:`geopandas.GeoDataFrame.to_crs` call.
+    chunksize : int, optional
+        Number of coordinates transformed per chunk. Defaults to
+        ``250000``.
 
     Returns
     -------
@@ -45,11 +162,263 @@ def transformToUTM(gdf, utm_crs, estimate=True, calculate_sindex=True):
         `utm_crs` coordinate reference system.
 
     """
-
-    gdf = gdf.to_crs(utm_crs)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    geoms = np.asarray(gdf.geometry.values)
+    if (n_workers < 2 or gdf.crs is None
+            or shapely.get_num_coordinates(geoms).sum() <= chunksize):
+        return gdf.to_crs(utm_crs)
+    dst_crs = pyproj.CRS.from_user_input(utm_crs)
+    if gdf.crs.is_exact_same(dst_crs):
+        return gdf.to_crs(dst_crs)
+    transformer = _get_transformer(gdf.crs, dst_crs)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        new_geoms = _transform_geometries(geoms, transformer, executor,
+                                          chunksize)
+    gdf = gdf.copy()
+    gdf.geometry = gpd.GeoSeries(new_geoms, index=gdf.index, crs=dst_crs)
     return gdf
 
 
+@lru_cache(maxsize=16)
+def _get_transformer(src_crs, dst_crs):
+    """Cached transformer between two CRSs. It is thread-safe."""
+    return pyproj.Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def _transform_geometries(geoms, transformer, executor, chunksize):
+    """Transform the coordinates of `geoms` in chunks on `executor`."""
+    result = np.empty_like(geoms)
+    has_z = shapely.has_z(geoms)
+    for selected, include_z in ((~has_z, False), (has_z, True)):
+        if not selected.any():
+            continue
+        coords = shapely.get_coordinates(geoms[selected], include_z=include_z)
+        columns = [np.ascontiguousarray(coords[:, i])
+                   for i in range(coords.shape[1])]
+        starts = range(0, len(coords), chunksize)
+        chunks = executor.map(
+            lambda start: transformer.transform(
+                *[column[start:start + chunksize] for column in columns]),
+            starts)
+        for start, chunk in zip(starts, chunks):
+            coords[start:start + chunksize] = np.column_stack(chunk)
+        # replaces every coordinate at once, with no per-geometry loop
+        result[selected] = shapely.set_coordinates(geoms[selected].copy(),
+                                                   coords)
+    return result
+
+
+# Bump when the cached columns or their computation change, so that entries
+# written by older versions are not reused.
+_CACHE_VERSION = 5
+
+
+def read_vector_file_utm(geoFileName, utm_crs, cache_dir=None, bbox=None,
+                         calculate_sindex=None, cells=None):
+    """Read a vector file transformed to UTM, using an on-disk cache.
+
+    Reprojecting a large label file with :func:`transformToUTM` is repeated
+    on every run. With `cache_dir`, the reprojected features are saved
+    there the first time, keyed by the file's path, size and modification
+    time, `utm_crs` and `bbox`, and later calls load them instead. The
+    cache holds the geometries as one WKB array, the index and attribute
+    columns as NumPy arrays, and the `origarea` and `origlen` columns of
+    :func:`add_orig_measures` . Nothing is unpickled when loading.
+
+    A spatial index cannot be saved, so instead the features intersecting
+    each of `cells` (see :func:`join_cells_to_features`) can be cached as
+    well. A warm call with the same `cells` then needs neither a
+    reprojection nor a spatial index.
+
+    Arguments
+    ---------
+    geoFileName : str
+        Path to the vector file.
+    utm_crs : str
+        :py:class:`rasterio.crs.CRS` string for destination UTM CRS.
+    cache_dir : str, optional
+        Directory for cached files. Defaults to ``None`` (no caching).
+    bbox : list-like of shape ``(W, S, E, N)``, optional
+        Only read features that intersect these WGS84 bounds. See
+        :func:`read_vector_file` .
+    calculate_sindex : bool, optional
+        Build the spatial index of the result before returning it. Defaults
+        to ``True`` if `cells` is not given, ``False`` otherwise.
+    cells : dict of lists or array-like of shape ``(N, 4)``, optional
+        Cell boundaries in `utm_crs` to join to the features.
+
+    Returns
+    -------
+    gdf : :py:class:`geopandas.GeoDataFrame`
+        The features in `utm_crs`, with `origarea` and `origlen` columns.
+    indptr, indices : :class:`numpy.ndarray`
+        Only returned if `cells` is given: the features intersecting each
+        cell, as returned by :func:`join_cells_to_features` .
+
+    """
+    if calculate_sindex is None:
+        calculate_sindex = cells is None
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, _cache_key(geoFileName, utm_crs,
+                                                        bbox))
+    if cache_path is not None and os.path.exists(cache_path + '.json'):
+        gdf = _load_cached_gdf(cache_path)
+    else:
+        gdf = transformToUTM(read_vector_file(geoFileName, bbox=bbox),
+                             utm_crs=utm_crs)
+        gdf = add_orig_measures(gdf)
+        if cache_path is not None and not _save_cached_gdf(gdf, cache_path):
+            cache_path = None
+    if calculate_sindex:
+        gdf.sindex
+    if cells is None:
+        return gdf
+
+    cell_array = cells_to_array(cells)
+    join_path = None
+    if cache_path is not None:
+        join_path = '{}.{}.join.npz'.format(cache_path, hashlib.sha1(
+            np.ascontiguousarray(cell_array, dtype=np.float64)).hexdigest())
+    if join_path is not None and os.path.exists(join_path):
+        with np.load(join_path) as arrays:
+            return gdf, arrays['indptr'], arrays['indices']
+    indptr, indices = join_cells_to_features(gdf, cell_array)
+    if join_path is not None:
+        _savez_atomic(join_path, indptr=indptr, indices=indices)
+    return gdf, indptr, indices
+
+
+def _cache_key(geoFileName, utm_crs, bbox):
+    """Fingerprint of a vector file and the parameters of its transform."""
+    stat = os.stat(geoFileName)
+    key = repr((_CACHE_VERSION, os.path.abspath(geoFileName), stat.st_size,
+                stat.st_mtime_ns, str(utm_crs),
+                None if bbox is None else tuple(bbox)))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _savez_atomic(path, **arrays):
+    tmp_path = path[:-len('.npz')] + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _save_cached_gdf(gdf, cache_path):
+    """Save `gdf` to the cache. Returns ``False`` if it cannot be cached."""
+    arrays = {}
+    columns = []
+    for i, name in enumerate(gdf.columns):
+        if name == gdf.geometry.name:
+            columns.append({'name': name, 'kind': 'geometry'})
+            continue
+        column = _save_cached_values(gdf[name], 'column{}'.format(i), arrays)
+        if column is None:
+            warnings.warn('Column {} of type {} cannot be cached.'.format(
+                name, gdf[name].dtype))
+            return False
+        column['name'] = name
+        columns.append(column)
+
+    if isinstance(gdf.index, pd.RangeIndex):
+        index = {'kind': 'range', 'start': gdf.index.start,
+                 'stop': gdf.index.stop, 'step': gdf.index.step}
+    elif isinstance(gdf.index, pd.MultiIndex):
+        index = None
+    else:
+        index = _save_cached_values(gdf.index.to_series(), 'index', arrays)
+    if index is None:
+        warnings.warn('Index of type {} cannot be cached.'.format(
+            type(gdf.index).__name__))
+        return False
+    index['name'] = gdf.index.name
+
+    geoms = np.asarray(gdf.geometry.values)
+    missing = shapely.is_missing(geoms)
+    # all geometries as one GeometryCollection, split again with get_parts
+    wkb = struct.pack('<BII', 1, 7, int((~missing).sum())) + b''.join(
+        shapely.to_wkb(geoms[~missing]))
+    arrays['geometry'] = np.frombuffer(wkb, dtype=np.uint8)
+    arrays['geometry_missing'] = missing
+
+    if os.path.dirname(cache_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    _savez_atomic(cache_path + '.npz', **arrays)
+    meta = {'version': _CACHE_VERSION, 'columns': columns, 'index': index,
+            'crs': gdf.crs.to_wkt() if gdf.crs is not None else None}
+    # the .json is written last and marks a complete entry
+    with open(cache_path + '.tmp.json', 'w') as f:
+        json.dump(meta, f)
+    os.replace(cache_path + '.tmp.json', cache_path + '.json')
+    return True
+
+
+def _save_cached_values(values, key, arrays):
+    """Add the arrays of a Series to `arrays`, and return how to load them.
+
+    Returns ``None`` if the type of `values` cannot be cached.
+    """
+    column = {'key': key, 'kind': 'array'}
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        column.update(kind='datetimetz', tz=str(values.dt.tz))
+        arrays[key] = values.dt.tz_convert('UTC').dt.tz_localize(None).values
+    elif isinstance(values.dtype, np.dtype) and \
+            values.dtype.kind in 'biufcmM':
+        arrays[key] = values.values
+    elif pd.api.types.is_string_dtype(values.dtype) and (
+            values.dtype != object or (values.map(
+                lambda value: isinstance(value, str)) |
+                values.isnull()).all()):
+        # object columns only hold text if all their values are strings
+        column.update(kind='string', dtype=str(values.dtype))
+        missing = values.isnull().values
+        arrays[key] = np.array(values.where(~missing, ''), dtype=str)
+        arrays[key + '_missing'] = missing
+    else:
+        return None
+    return column
+
+
+def _load_cached_values(column, arrays):
+    values = arrays[column['key']]
+    if column['kind'] == 'string':
+        values = values.astype(object)
+        values[arrays[column['key'] + '_missing']] = None
+        values = pd.array(values, dtype=column['dtype'])
+    elif column['kind'] == 'datetimetz':
+        values = pd.Series(values).dt.tz_localize('UTC').dt.tz_convert(
+            column['tz']).array
+    return values
+
+
+def _load_cached_gdf(cache_path):
+    with open(cache_path + '.json') as f:
+        meta = json.load(f)
+    data = {}
+    with np.load(cache_path + '.npz') as arrays:
+        missing = arrays['geometry_missing']
+        geoms = np.full(len(missing), None, dtype=object)
+        geoms[~missing] = shapely.get_parts(
+            shapely.from_wkb(arrays['geometry'].tobytes()))
+        for column in meta['columns']:
+            name, kind = column['name'], column['kind']
+            if kind == 'geometry':
+                geometry_name = name
+                data[name] = geoms
+                continue
+            data[name] = _load_cached_values(column, arrays)
+        index = meta['index']
+        if index['kind'] == 'range':
+            index = pd.RangeIndex(index['start'], index['stop'],
+                                  index['step'], name=index['name'])
+        else:
+            index = pd.Index(_load_cached_values(index, arrays),
+                             name=index['name'])
+    return gpd.GeoDataFrame(data, index=index, geometry=geometry_name,
+                            crs=meta['crs'])
+
+
 def search_gdf_bounds(gdf, tile_bounds):
     """Use `tile_bounds` to subset `gdf` and return the intersect.
 
@@ -104,8 +473,54 @@ def search_gdf_polygon(gdf, tile_polygon):
     return precise_matches
 
 
+def _select_features(gdf, feature_indices):
+    """Rows of `gdf` at `feature_indices`, as :func:`search_gdf_polygon`."""
+    if len(feature_indices) == 0:
+        return gpd.GeoDataFrame(geometry=[])
+    return gdf.iloc[feature_indices]
+
+
+def join_cells_to_features(gdf, cells):
+    """Find the features of `gdf` that intersect each cell, in one query.
+
+    Calling :func:`search_gdf_polygon` once per tile repeats a spatial index
+    query, a row selection and a precise intersection test for every tile.
+    This function runs a single bulk query of all of `cells` against the
+    spatial index of `gdf` instead.
+
+    Arguments
+    ---------
+    gdf : :py:class:`geopandas.GeoDataFrame`
+        A :py:class:`geopandas.GeoDataFrame` of features to search.
+    cells : dict of lists or array-like of shape ``(N, 4)``
+        Cell boundaries ``[W, S, E, N]`` in the CRS of `gdf`, as accepted by
+        :func:`cw_tiler.main.cells_to_array` .
+
+    Returns
+    -------
+    indptr : :class:`numpy.ndarray`
+        ``int64`` array of length ``N + 1``.
+    indices : :class:`numpy.ndarray`
+        ``int64`` positional (``iloc``) indices into `gdf`. The features
+        that intersect cell ``i`` are ``indices[indptr[i]:indptr[i + 1]]``,
+        in ascending order, as in a CSR sparse matrix.
+
+    """
+    cell_array = cells_to_array(cells)
+    cell_boxes = shapely.box(cell_array[:, 0], cell_array[:, 1],
+                             cell_array[:, 2], cell_array[:, 3])
+    cell_idx, feature_idx = gdf.sindex.query(cell_boxes,
+                                             predicate='intersects')
+    order = np.lexsort((feature_idx, cell_idx))
+    counts = np.bincount(cell_idx, minlength=len(cell_array))
+    indptr = np.zeros(len(cell_array) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, feature_idx[order].astype(np.int64)
+
+
 def vector_tile_utm(gdf, tile_bounds, min_partial_perc=0.1,
-                    geom_type="Polygon", use_sindex=True):
+                    geom_type="Polygon", use_sindex=True,
+                    feature_indices=None, line_partial=False):
     """Wrapper for :func:`clip_gdf` that converts `tile_bounds` to a polygon.
 
     Arguments
@@ -122,6 +537,13 @@ def vector_tile_utm(gdf, tile_bounds, min_partial_perc=0.1,
     use_sindex : bool, optional
         Use the `gdf` sindex be used for searching. Improves efficiency
         but requires `libspatialindex <http://libspatialindex.github.io/>`__ .
+    feature_indices : array-like of ints, optional
+        Positional indices of the features of `gdf` that intersect the tile,
+        e.g. one row of :func:`join_cells_to_features` . If provided, no
+        spatial search is done.
+    line_partial : bool, optional
+        Measure the clipped fraction of LineStrings. See :func:`clip_gdf` .
+        Defaults to ``False``.
 
     Returns
     -------
@@ -132,7 +554,9 @@ def vector_tile_utm(gdf, tile_bounds, min_partial_perc=0.1,
     tile_polygon = box(*tile_bounds)
     small_gdf = clip_gdf(gdf, tile_polygon,
                          min_partial_perc=min_partial_perc,
-                         geom_type=geom_type
+                         geom_type=geom_type,
+                         feature_indices=feature_indices,
+                         line_partial=line_partial
                          )
 
     return small_gdf
@@ -146,7 +570,7 @@ def getCenterOfGeoFile(gdf, estimate=True):
 
 
 def clip_gdf(gdf, poly_to_cut, min_partial_perc=0.0, geom_type="Polygon",
-             use_sindex=True):
+             use_sindex=True, feature_indices=None, line_partial=False):
     """Clip GDF to a provided polygon.
 
     Note
@@ -163,9 +587,11 @@ def clip_gdf(gdf, poly_to_cut, min_partial_perc=0.0, geom_type="Polygon",
     `partialDec`
         The fraction of the object that remains after clipping
         (fraction of area for Polygons, fraction of length for
-        LineStrings.) Can filter based on this by using `min_partial_perc`.
+        LineStrings if `line_partial` is ``True``, ``1`` otherwise.) Can
+        filter based on this by using `min_partial_perc`.
     `truncated`
-        Boolean indicator of whether or not an object was clipped.
+        Boolean indicator of whether or not an object was clipped (always
+        ``0`` for LineStrings unless `line_partial` is ``True``).
 
     Arguments
     ---------
@@ -183,6 +609,15 @@ def clip_gdf(gdf, poly_to_cut, min_partial_perc=0.0, geom_type="Polygon",
     use_sindex : bool, optional
         Use the `gdf` sindex be used for searching. Improves efficiency
         but requires `libspatialindex <http://libspatialindex.github.io/>`__ .
+    feature_indices : array-like of ints, optional
+        Positional indices of the features of `gdf` that intersect
+        `poly_to_cut`, e.g. from :func:`join_cells_to_features` . If
+        provided, these features are clipped without searching `gdf`.
+    line_partial : bool, optional
+        If ``True``, the `partialDec` of LineStrings is the fraction of their
+        length that remains after clipping, and `min_partial_perc` applies
+        to them. Defaults to ``False``: LineStrings are kept if any part
+        remains, with a `partialDec` of ``1`` and a `truncated` of ``0``.
 
     Returns
     -------
@@ -194,43 +629,93 @@ def clip_gdf(gdf, poly_to_cut, min_partial_perc=0.0, geom_type="Polygon",
 
     # check if geoDF has origAreaField
 
-    if use_sindex:
+    rows = None
+    if feature_indices is not None:
+        if (len(feature_indices) and 'origarea' in gdf.columns and
+                'origlen' in gdf.columns):
+            # take the rows only once, after clipping
+            rows = np.asarray(feature_indices, dtype=np.int64)
+        else:
+            gdf = _select_features(gdf, feature_indices)
+    elif use_sindex:
         gdf = search_gdf_polygon(gdf, poly_to_cut)
 
-    # if geom_type == "LineString":
-    if 'origarea' in gdf.columns:
-        pass
-    else:
-        if "geom_type" == "LineString":
-            gdf['origarea'] = 0
-        else:
-            gdf['origarea'] = gdf.area
-    if 'origlen' in gdf.columns:
-        pass
-    else:
-        if "geom_type" == "LineString":
-            gdf['origlen'] = gdf.length
-        else:
-            gdf['origlen'] = 0
-    # TODO must implement different case for lines and for spatialIndex
-    # (Assume RTree is already performed)
+    gdf = add_orig_measures(gdf, geom_type=geom_type)
 
-    cutGeoDF = gdf.copy()
-    cutGeoDF.geometry = gdf.intersection(poly_to_cut)
+    geoms = np.asarray(gdf.geometry.values)
+    if rows is not None:
+        geoms = geoms[rows]
+    shapely.prepare(poly_to_cut)
+    # features inside the tile are kept as they are; only those crossing
+    # its boundary are clipped.
+    inside = shapely.covered_by(geoms, poly_to_cut)
+    cut_geoms = geoms.copy()
+    cut_geoms[~inside] = shapely.intersection(geoms[~inside], poly_to_cut)
 
     if geom_type == 'Polygon':
-        cutGeoDF['partialDec'] = cutGeoDF.area / cutGeoDF['origarea']
-        cutGeoDF = cutGeoDF.loc[cutGeoDF['partialDec'] > min_partial_perc, :]
-        cutGeoDF['truncated'] = (cutGeoDF['partialDec'] != 1.0).astype(int)
+        measure, orig_column = shapely.area, 'origarea'
+    else:
+        measure, orig_column = shapely.length, 'origlen'
+    orig = gdf[orig_column].values
+    if rows is not None:
+        orig = orig[rows]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        partial = measure(cut_geoms) / orig
+    if geom_type != 'Polygon' and not line_partial:
+        keep = ~shapely.is_empty(cut_geoms)
+        partial = np.ones(len(cut_geoms), dtype=np.int64)
     else:
-        cutGeoDF = cutGeoDF[cutGeoDF.geom_type != "GeometryCollection"]
-        cutGeoDF['partialDec'] = 1
-        cutGeoDF['truncated'] = 0
-    # TODO: IMPLEMENT TRUNCATION MEASUREMENT FOR LINESTRINGS
+        keep = partial > min_partial_perc
+    if geom_type != 'Polygon':
+        keep &= shapely.get_type_id(cut_geoms) != 7  # GeometryCollection
+    take = np.flatnonzero(keep) if rows is None else rows[keep]
+
+    cutGeoDF = gdf.iloc[take].copy()
+    cutGeoDF.geometry = gpd.GeoSeries(cut_geoms[keep], index=cutGeoDF.index,
+                                      crs=gdf.crs)
+    cutGeoDF['partialDec'] = partial[keep]
+    cutGeoDF['truncated'] = (partial[keep] != 1.0).astype(int)
 
     return cutGeoDF
 
 
+def add_orig_measures(gdf, geom_type=None):
+    """Add the `origarea` and `origlen` columns used by :func:`clip_gdf`.
+
+    :func:`clip_gdf` computes these for every tile that lacks them. Calling
+    this once on the whole dataset before tiling computes them once, and
+    every subset of `gdf` then carries them. Lines get their length as
+    `origlen` and an `origarea` of ``0``; other objects get their area as
+    `origarea` and an `origlen` of ``0``.
+
+    Arguments
+    ---------
+    gdf : :py:class:`geopandas.GeoDataFrame`
+        A :py:class:`geopandas.GeoDataFrame` of objects.
+    geom_type : str, optional
+        Type of objects in `gdf`. Can be one of
+        ``["Polygon", "LineString"]`` . By default, lines are found from
+        the geometry type of each object.
+
+    Returns
+    -------
+    gdf : :py:class:`geopandas.GeoDataFrame`
+        `gdf` with `origarea` and `origlen` columns. Existing columns are
+        left unchanged.
+
+    """
+    if geom_type is None:
+        is_line = gdf.geom_type.isin(
+            ['LineString', 'MultiLineString', 'LinearRing']).values
+    else:
+        is_line = np.full(len(gdf), geom_type == 'LineString')
+    if 'origarea' not in gdf.columns:
+        gdf['origarea'] = np.where(is_line, 0.0, gdf.area)
+    if 'origlen' not in gdf.columns:
+        gdf['origlen'] = np.where(is_line, gdf.length, 0.0)
+    return gdf
+
+
 def rasterize_gdf(gdf, src_shape, burn_value=1,
                   src_transform=Affine(1.0, 0.0, 0.0, 0.0, 1.0, 0.0)):
     """Convert a GeoDataFrame to a binary image (array) mask.
@@ -268,3 +753,274 @@ def rasterize_gdf(gdf, src_shape, burn_value=1,
         img = np.zeros(src_shape).astype(np.uint8)
 
     return img
+
+
+def rasterize_labels(gdf, src_shape, channels=('mask',), class_column=None,
+                     id_column=None,
+                     src_transform=Affine(1.0, 0.0, 0.0, 0.0, 1.0, 0.0),
+                     out=None, dtype=None, all_touched=False):
+    """Rasterize several label channels from `gdf` in a single burn.
+
+    The features are burned once as instance numbers ``1..N`` (later
+    features over earlier ones, as in :func:`rasterize_gdf`), and every
+    requested channel is derived from that raster with a lookup, rather
+    than burning the same geometries once per channel.
+
+    Arguments
+    ---------
+    gdf : :py:class:`geopandas.GeoDataFrame`
+        A :py:class:`geopandas.GeoDataFrame` of objects to rasterize.
+    src_shape : list-like of 2 ints
+        Shape of the output array in ``(Y, X)`` pixel units.
+    channels : list of str, optional
+        Channels to produce, in order. Any of:
+
+        ``"mask"``
+            ``1`` where there is an object, as :func:`rasterize_gdf` .
+        ``"class"``
+            Values of `class_column` for each object.
+        ``"instance"``
+            Values of `id_column` for each object, or ``1..N`` in the
+            order of `gdf` if `id_column` is not given.
+        ``"boundary"``
+            ``1`` on the pixels of each object that border a pixel of
+            another object or of the background.
+
+        ``0`` is the background in every channel. Defaults to
+        ``("mask",)``.
+    class_column : str, optional
+        Column of non-negative integer class values. Required for
+        ``"class"``.
+    id_column : str, optional
+        Column of non-negative integer object IDs for ``"instance"``.
+    src_transform : :py:class:`affine.Affine`, optional
+        Affine transformation for the output raster. If not provided, defaults
+        to arbitrary pixel units.
+    out : :class:`numpy.ndarray`, optional
+        ``(len(channels), Y, X)`` array to write the labels into.
+    dtype : str, optional
+        Output data type. By default, the smallest of ``uint8``, ``uint16``
+        and ``uint32`` that holds every label value. Ignored if `out` is
+        given.
+    all_touched : bool, optional
+        Burn all pixels touched by objects rather than only those whose
+        centers are inside them. Defaults to ``False``.
+
+    Returns
+    -------
+    img : :class:`numpy.ndarray`
+        Array of shape ``(len(channels), Y, X)``, `out` if it was given.
+
+    """
+    n_features = len(gdf)
+    lookups = []
+    for channel in channels:
+        if channel in ('mask', 'boundary'):
+            values = np.ones(n_features, dtype=np.int64)
+        elif channel == 'class':
+            if class_column is None:
+                raise ValueError('The "class" channel needs class_column.')
+            values = _label_values(gdf, class_column)
+        elif channel == 'instance':
+            values = (np.arange(1, n_features + 1) if id_column is None
+                      else _label_values(gdf, id_column))
+        else:
+            raise ValueError('Unknown channel: {}'.format(channel))
+        lookups.append(np.concatenate([[0], values]).astype(np.int64))
+
+    max_value = max(int(lut.max()) for lut in lookups)
+    if out is None:
+        if dtype is None:
+            dtype = _label_dtype(max_value)
+        out = np.zeros((len(channels),) + tuple(src_shape), dtype=dtype)
+    elif out.shape != (len(channels),) + tuple(src_shape):
+        raise ValueError('out has shape {}, expected {}.'.format(
+            out.shape, (len(channels),) + tuple(src_shape)))
+    if (np.issubdtype(out.dtype, np.integer) and
+            max_value > np.iinfo(out.dtype).max):
+        raise ValueError('Label value {} does not fit in {}.'.format(
+            max_value, out.dtype))
+    if n_features == 0:
+        out[...] = 0
+        return out
+
+    instances = features.rasterize(
+        zip(gdf.geometry, range(1, n_features + 1)),
+        out_shape=src_shape, transform=src_transform,
+        all_touched=all_touched, dtype=_label_dtype(n_features))
+    for channel, lut, band in zip(channels, lookups, out):
+        band[...] = lut[instances]
+        if channel == 'boundary':
+            # works for any dtype of `out`, unlike &=
+            band[~_instance_edges(instances)] = 0
+    return out
+
+
+def _label_values(gdf, column):
+    """Values of a label column, checked to be non-negative integers."""
+    values = gdf[column].values
+    if not np.issubdtype(values.dtype, np.integer):
+        values = values.astype(np.float64)
+        if not np.all(np.isfinite(values)):
+            raise ValueError('{} has missing or non-finite values.'.format(
+                column))
+        if not np.all(values == np.round(values)):
+            raise ValueError('{} has non-integer values.'.format(column))
+    if len(values) and values.min() < 0:
+        raise ValueError('{} has negative values.'.format(column))
+    return values.astype(np.int64)
+
+
+def _label_dtype(max_value):
+    """Smallest unsigned integer dtype that holds `max_value`."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError('Label values must fit in uint32.')
+
+
+def _instance_edges(instances):
+    """``1`` where a pixel's 4-neighbours include a different instance."""
+    edges = np.zeros(instances.shape, dtype=bool)
+    diff_y = instances[1:, :] != instances[:-1, :]
+    diff_x = instances[:, 1:] != instances[:, :-1]
+    edges[1:, :] |= diff_y
+    edges[:-1, :] |= diff_y
+    edges[:, 1:] |= diff_x
+    edges[:, :-1] |= diff_x
+    return edges & (instances > 0)
+
+
+class LabelRaster(object):
+    """Labels rasterized once over a whole analysis grid, sliced per chip.
+
+    Calling :func:`rasterize_gdf` for every chip burns each feature once per
+    chip that covers it. A :class:`LabelRaster` burns all features once onto
+    the pixel lattice shared by the chips of an analysis grid, and
+    :meth:`chip` then cuts each chip's labels out of it as an array slice.
+
+    Arguments
+    ---------
+    labels : :class:`numpy.ndarray`
+        2D label array, e.g. a :class:`numpy.memmap` .
+    transform : :py:class:`affine.Affine`
+        Affine transformation of `labels`.
+    crs : str, optional
+        Coordinate reference system of `labels`.
+
+    """
+
+    def __init__(self, labels, transform, crs=None):
+        self.labels = labels
+        self.transform = transform
+        self.crs = crs
+
+    @classmethod
+    def from_gdf(cls, gdf, cells, tilesize, path=None, burn_value=1,
+                 dtype='uint8', all_touched=False):
+        """Rasterize `gdf` once over the extent of `cells`.
+
+        The lattice has the pixel size of the chips (cell size divided by
+        `tilesize`) and its lower left corner at the lower left corner of
+        the grid, so chips of :func:`cw_tiler.main.calculate_analysis_grid`
+        whose stride is a whole number of pixels fall on whole pixels.
+
+        Arguments
+        ---------
+        gdf : :py:class:`geopandas.GeoDataFrame`
+            Features to burn, in the CRS of `cells`.
+        cells : dict of lists or array-like of shape ``(N, 4)``
+            Cell boundaries ``[W, S, E, N]``, as accepted by
+            :func:`cw_tiler.main.cells_to_array` .
+        tilesize : int
+            Chip size in pixels.
+        path : str, optional
+            Path of a ``.npy`` file to hold the labels as a memory map, with
+            the georeferencing in a ``.json`` sidecar (see :meth:`open`). By
+            default, the labels are held in memory.
+        burn_value : int, optional
+            Value for pixels covered by features. Defaults to ``1``.
+        dtype : str, optional
+            Label data type. Defaults to ``"uint8"``.
+        all_touched : bool, optional
+            Burn all pixels touched by features rather than only those whose
+            centers are inside them. Defaults to ``False``, as in
+            :func:`rasterize_gdf` .
+
+        Returns
+        -------
+        :class:`LabelRaster`
+
+        """
+        cell_array = cells_to_array(cells)
+        res = (cell_array[0, 2] - cell_array[0, 0]) / float(tilesize)
+        west, south = cell_array[:, 0].min(), cell_array[:, 1].min()
+        width = int(np.ceil((cell_array[:, 2].max() - west) / res - 1e-6))
+        height = int(np.ceil((cell_array[:, 3].max() - south) / res - 1e-6))
+        transform = Affine(res, 0.0, west, 0.0, -res, south + height * res)
+        if path is None:
+            labels = np.zeros((height, width), dtype=dtype)
+        else:
+            labels = np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                               shape=(height, width))
+        if not gdf.empty:
+            features.rasterize(((geom, burn_value) for geom in gdf.geometry),
+                               out=labels, transform=transform,
+                               all_touched=all_touched)
+        crs = gdf.crs.to_wkt() if gdf.crs is not None else None
+        if path is not None:
+            labels.flush()
+            with open(path + '.json', 'w') as f:
+                json.dump({'transform': list(transform)[:6], 'crs': crs}, f)
+        return cls(labels, transform, crs=crs)
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """Open a label raster saved by :meth:`from_gdf` as a memory map."""
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode=mode),
+                   Affine(*meta['transform']), crs=meta['crs'])
+
+    def chip(self, tile_bounds, tilesize):
+        """Get the labels of one chip.
+
+        Arguments
+        ---------
+        tile_bounds : list-like of floats
+            ``(W, S, E, N)`` bounds of the chip.
+        tilesize : int
+            Chip size in pixels.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``(tilesize, tilesize)`` labels. If the chip falls on whole
+            pixels of the lattice and inside it, this is a view of
+            :attr:`labels`; otherwise it is a copy, sampled at the chip's
+            pixel centers, with ``0`` outside the lattice.
+
+        """
+        w, s, e, n = tile_bounds
+        res = self.transform.a
+        col, row = ~self.transform * (w, n)
+        aligned = (abs((e - w) / tilesize - res) <= 1e-6 * res and
+                   abs((n - s) / tilesize - res) <= 1e-6 * res and
+                   abs(col - round(col)) <= 1e-6 and
+                   abs(row - round(row)) <= 1e-6)
+        height, width = self.labels.shape
+        if aligned:
+            col, row = int(round(col)), int(round(row))
+            if (col >= 0 and row >= 0 and col + tilesize <= width and
+                    row + tilesize <= height):
+                return self.labels[row:row + tilesize, col:col + tilesize]
+        centers = (np.arange(tilesize) + 0.5) / tilesize
+        cols = np.floor((w + centers * (e - w) - self.transform.c) / res)
+        rows = np.floor((self.transform.f - (n - centers * (n - s))) / res)
+        cols, rows = cols.astype(np.int64), rows.astype(np.int64)
+        valid = (rows[:, None] >= 0) & (rows[:, None] < height) & \
+            (cols[None, :] >= 0) & (cols[None, :] < width)
+        out = np.zeros((tilesize, tilesize), dtype=self.labels.dtype)
+        out[valid] = self.labels[np.clip(rows, 0, height - 1)[:, None],
+                                 np.clip(cols, 0, width - 1)[None, :]][valid]
+        return out
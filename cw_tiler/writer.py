@@ -0,0 +1,176 @@
+"""cw_tiler.writer: write chips to disk from background threads."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
+import rasterio
+
+
+_DRIVERS = {'.tif': 'GTiff', '.tiff': 'GTiff', '.png': 'PNG', '.npy': 'NPY'}
+
+
+class ChipWriter(object):
+    """Write chips to GeoTIFF, PNG or NPY files from background threads.
+
+    Writing each chip after :func:`cw_tiler.main.tile_utm` returns makes
+    reading and encoding alternate. A :class:`ChipWriter` takes chips with
+    :meth:`submit` and writes them on `n_workers` threads, so compression
+    and disk I/O overlap with reading the next chips. At most `max_pending`
+    chips are held in memory: :meth:`submit` blocks once that many are
+    waiting to be written.
+
+    The format is chosen from the file extension: ``.tif``/``.tiff``
+    (georeferenced GeoTIFF, with `mask` as an internal mask), ``.png``
+    (with `mask` as an alpha band) or ``.npy`` (the data array only).
+
+    Arguments
+    ---------
+    n_workers : int, optional
+        Number of writer threads. Defaults to ``2``.
+    max_pending : int, optional
+        Maximum number of chips submitted but not yet written. Defaults to
+        ``4 * n_workers``.
+    **creation_options
+        GDAL creation options for GeoTIFF output, e.g. ``compress='lzw'``.
+        Defaults to ``compress='deflate'``.
+
+    Attributes
+    ----------
+    written : int
+        Number of chips written so far.
+
+    """
+
+    def __init__(self, n_workers=2, max_pending=None, **creation_options):
+        if n_workers < 1:
+            raise ValueError('n_workers must be at least 1.')
+        if max_pending is None:
+            max_pending = 4 * n_workers
+        self.creation_options = creation_options or {'compress': 'deflate'}
+        self.written = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=n_workers)
+        # futures are dropped as they complete; only the first error is kept
+        self._pending = set()
+        self._error = None
+        self._lock = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, path, data, mask=None, window_transform=None, crs=None):
+        """Queue a chip to be written to `path`.
+
+        Blocks while `max_pending` chips are waiting to be written. `data`
+        and `mask` are written as they are when the chip's turn comes, so
+        they must not be modified after submitting.
+
+        Arguments
+        ---------
+        path : str
+            Output file path. Its extension selects the format.
+        data : :class:`numpy.ndarray`
+            Chip of shape ``(C, Y, X)`` or ``(Y, X)``.
+        mask : :class:`numpy.ndarray`, optional
+            ``(Y, X)`` mask with ``255`` for valid pixels and ``0`` for
+            `nodata`, as returned by :func:`cw_tiler.main.tile_utm` .
+        window_transform : :py:class:`affine.Affine`, optional
+            Affine transformation of the chip.
+        crs : str or :py:class:`rasterio.crs.CRS`, optional
+            Coordinate reference system of the chip.
+
+        Returns
+        -------
+        :class:`concurrent.futures.Future`
+            Future that completes when the chip has been written.
+
+        """
+        driver = _DRIVERS.get(os.path.splitext(path)[1].lower())
+        if driver is None:
+            raise ValueError('Unsupported chip format: {}'.format(path))
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, driver, path, data,
+                                           mask, window_transform, crs)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def flush(self):
+        """Wait until all submitted chips are written.
+
+        Raises the first error encountered by a writer thread, if any.
+        """
+        with self._lock:
+            while self._pending:
+                self._lock.wait()
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        """Flush pending chips and stop the writer threads."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _done(self, future):
+        exc = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._pending.discard(future)
+            if exc is not None and self._error is None:
+                self._error = exc
+            self._lock.notify_all()
+
+    def _write(self, driver, path, data, mask, window_transform, crs):
+        try:
+            if data.ndim == 2:
+                data = data[np.newaxis]
+            if driver == 'NPY':
+                np.save(path, data)
+            else:
+                _write_raster(driver, path, data, mask, window_transform,
+                              crs, self.creation_options)
+            with self._lock:
+                self.written += 1
+        finally:
+            self._slots.release()
+
+
+def _write_raster(driver, path, data, mask, window_transform, crs,
+                  creation_options):
+    """Write a chip with rasterio."""
+    count = data.shape[0]
+    profile = dict(driver=driver, width=data.shape[2], height=data.shape[1],
+                   count=count, dtype=data.dtype, crs=crs,
+                   transform=window_transform)
+    if driver == 'GTiff':
+        profile.update(creation_options)
+    elif mask is not None:
+        # PNG has no mask band; store the mask as alpha.
+        profile['count'] = count + 1
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data, indexes=list(range(1, count + 1)))
+        if mask is None:
+            return
+        if driver == 'GTiff':
+            dst.write_mask(mask)
+        else:
+            dst.write(_alpha(mask, data.dtype), count + 1)
+
+
+def _alpha(mask, dtype):
+    """Scale a ``0``-``255`` mask to the full range of `dtype`."""
+    if not np.issubdtype(dtype, np.integer):
+        return mask.astype(dtype)
+    scale = np.iinfo(dtype).max / 255.0
+    return np.round(mask * scale).astype(dtype)
@@ -6,7 +6,11 @@ with open('README.md') as f:
     readme = f.read()
 
 # Runtime requirements.
-inst_reqs = ["rio-tiler", "shapely", "geopandas"]
+# The vectorized label code needs the shapely 2 array API, bulk spatial index
+# queries from geopandas and Arrow batch reads from pyogrio. Label
+# reprojection builds its own pyproj transformers (always_xy needs 2.2).
+inst_reqs = ["rio-tiler", "shapely>=2.0", "geopandas>=0.14", "pyogrio>=0.8",
+             "pyproj>=2.2"]
 
 extra_reqs = {
     'test': ['mock', 'pytest', 'pytest-cov', 'codecov']}
@@ -19,8 +23,7 @@ setup(name='cw_tiler',
           'Intended Audience :: Information Technology',
           'Intended Audience :: Science/Research',
           'License :: OSI Approved :: BSD License',
-          'Programming Language :: Python :: 3.6',
-          'Programming Language :: Python :: 2.7',
+          'Programming Language :: Python :: 3',
           'Topic :: Scientific/Engineering :: GIS'],
       keywords='raster aws tiler gdal rasterio spacenet machinelearning',
       author=u"David Lindenbaum and Nick Weir",
@@ -29,5 +32,6 @@ setup(name='cw_tiler',
       license='BSD',
       packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
       zip_safe=False,
+      python_requires='>=3.9',
       install_requires=inst_reqs,
       extras_require=extra_reqs)
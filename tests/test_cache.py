@@ -0,0 +1,235 @@
+"""tests cw_tiler.cache"""
+
+import _thread
+import gc
+import os
+import threading
+import time
+import weakref
+from shapely import geometry
+import rasterio
+from cw_tiler import main
+from cw_tiler import utils
+from cw_tiler.cache import VRTCache, DatasetPool, BlockCache, get_dataset_pool, get_vrt_cache
+import numpy as np
+
+
+PREFIX = os.path.join(os.path.dirname(__file__), 'fixtures')
+ADDRESS = '{}/my-bucket/hro_sources/colorado/201404_13SED190110_201404_0x1500m_CL_1.tif'.format(PREFIX)
+
+
+def _first_cell(src):
+    utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+    utm_bounds = utils.get_utm_bounds(src, utm_crs)
+    cells = main.calculate_analysis_grid(utm_bounds, stride_size_meters=10,
+                                         cell_size_meters=20)
+    return utm_crs, cells[0][0]
+
+
+def test_vrt_cache_reuses_vrt():
+    cache = VRTCache(maxsize=2)
+    with rasterio.open(ADDRESS) as src:
+        utm_crs, _ = _first_cell(src)
+        vrt = cache.get(src, utm_crs)
+        assert cache.get(src, utm_crs) is vrt
+        assert cache.get(src, utm_crs, nodata=0) is not vrt
+        assert len(cache) == 2
+        cache.get(src, 'EPSG:3857')
+        assert len(cache) == 2
+        assert vrt.closed
+        assert cache.evict(src) == 2
+        assert len(cache) == 0
+
+
+def test_vrt_cache_drops_closed_sources():
+    cache = VRTCache()
+    with rasterio.open(ADDRESS) as src:
+        utm_crs, _ = _first_cell(src)
+        vrt = cache.get(src, utm_crs)
+    with rasterio.open(ADDRESS) as src:
+        cache.get(src, utm_crs)
+        assert vrt.closed
+        assert len(cache) == 1
+    cache.close()
+    assert len(cache) == 0
+
+
+def test_default_vrt_cache_releases_sources():
+    cache = get_vrt_cache()
+    src = rasterio.open(ADDRESS)
+    utm_crs, cell = _first_cell(src)
+    utils.tile_read_utm(src, cell, 64, dst_crs=utm_crs, force_warp=True)
+    # a closed source is dropped by the next lookup and can be collected
+    src.close()
+    with rasterio.open(ADDRESS) as other:
+        utils.tile_read_utm(other, cell, 64, dst_crs=utm_crs, force_warp=True)
+        assert cache.evict(src) == 0
+        released = weakref.ref(src)
+        del src
+        gc.collect()
+        assert released() is None
+
+        # an open source is released by evict
+        assert cache.evict(other) == 1
+        released = weakref.ref(other)
+    del other
+    gc.collect()
+    assert released() is None
+
+
+def test_vrt_cache_per_thread():
+    cache = VRTCache(maxsize=1)
+    with rasterio.open(ADDRESS) as src:
+        utm_crs, _ = _first_cell(src)
+        vrt = cache.get(src, utm_crs)
+        others = []
+        thread = threading.Thread(
+            target=lambda: others.extend([cache.get(src, utm_crs), cache.get(src, 'EPSG:3857')]))
+        thread.start()
+        thread.join()
+        # other threads get their own VRTs and never evict this one
+        assert others[0] is not vrt and others[0].closed
+        assert not vrt.closed
+        # VRTs of exited threads are closed on the next lookup that builds one
+        cache.get(src, 'EPSG:3857')
+        assert others[1].closed and vrt.closed
+        assert len(cache) == 1
+    cache.close()
+
+
+def test_vrt_cache_keeps_vrts_of_raw_threads():
+    cache = VRTCache(maxsize=1)
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+    with rasterio.open(ADDRESS) as src:
+        utm_crs, _ = _first_cell(src)
+        others = []
+
+        def run():
+            others.append(cache.get(src, utm_crs))
+            started.set()
+            release.wait()
+            finished.set()
+        # threads not started through threading are not listed by threading.enumerate
+        _thread.start_new_thread(run, ())
+        started.wait()
+        cache.get(src, 'EPSG:3857')
+        assert not others[0].closed
+        release.set()
+        finished.wait()
+        for crs in ['EPSG:4326', 'EPSG:3857'] * 50:
+            cache.get(src, crs)
+            if others[0].closed:
+                break
+            time.sleep(0.01)
+        assert others[0].closed
+    cache.close()
+
+
+def test_tile_utm_cached_matches_uncached():
+    cache = VRTCache()
+    with rasterio.open(ADDRESS) as src:
+        utm_crs, cell = _first_cell(src)
+        cached = main.tile_utm(src, *cell, tilesize=64, dst_crs=utm_crs,
+                               vrt_cache=cache)
+        uncached = main.tile_utm(src, *cell, tilesize=64, dst_crs=utm_crs,
+                                 vrt_cache=False)
+        assert len(cache) == 1
+    assert np.array_equal(cached[0], uncached[0])
+    assert np.array_equal(cached[1], uncached[1])
+    cache.close()
+
+
+def test_dataset_pool_reuses_handles():
+    pool = DatasetPool(maxsize=1)
+    src = pool.get(ADDRESS)
+    assert pool.get(ADDRESS) is src
+    assert (pool.opens, pool.hits, pool.closes) == (1, 1, 0)
+    other = pool.get(ADDRESS, sharing=False)
+    assert other is not src
+    assert src.closed
+    assert (pool.opens, pool.closes) == (2, 1)
+    pool.close()
+    assert other.closed and len(pool) == 0
+
+
+def test_dataset_pool_per_thread_handles():
+    pool = DatasetPool(maxsize=1)
+    src = pool.get(ADDRESS)
+    results = []
+
+    def worker():
+        results.append(pool.get(ADDRESS))
+        results.append(pool.get(ADDRESS, sharing=False))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    # other threads get their own handles and never evict this one
+    assert results[0] is not src and results[0].closed
+    assert not src.closed
+    # handles of exited threads are closed on the next open
+    assert pool.get(ADDRESS, sharing=False) is not src
+    assert results[1].closed and src.closed
+    assert len(pool) == 1
+    pool.close()
+
+
+def test_dataset_pool_keeps_handles_of_raw_threads():
+    pool = DatasetPool(maxsize=1)
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def worker():
+        results.append(pool.get(ADDRESS))
+        started.set()
+        release.wait()
+    _thread.start_new_thread(worker, ())
+    started.wait()
+    pool.get(ADDRESS, sharing=False)
+    assert not results[0].closed
+    release.set()
+    pool.close()
+
+
+def test_source_info_owns_path_handles():
+    info = utils.SourceInfo(ADDRESS)
+    # the handle does not come from the pool, so the pool never closes it
+    get_dataset_pool().evict(ADDRESS)
+    assert not info.src.closed
+    info.close()
+    assert info.src.closed
+    with rasterio.open(ADDRESS) as src:
+        info = utils.SourceInfo(src)
+        info.close()
+        assert not src.closed
+
+
+def test_path_inputs_use_dataset_pool():
+    pool = get_dataset_pool()
+    pool.close()
+    opens = pool.opens
+    utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(ADDRESS))
+    utm_bounds = utils.get_utm_bounds(ADDRESS, utm_crs)
+    for _ in range(3):
+        main.get_chip(ADDRESS, utm_bounds[0] + 5, utm_bounds[1] + 5, 0.3,
+                      utm_crs=utm_crs, tilesize=32)
+    assert pool.opens == opens + 1
+    pool.close()
+
+
+def test_block_cache_matches_uncached():
+    cache = BlockCache()
+    with rasterio.open(ADDRESS) as src:
+        cells = main.calculate_analysis_grid(src.bounds, stride_size_meters=5,
+                                             cell_size_meters=10)
+        for cell in main.cells_to_array(cells)[:20]:
+            cached = utils.tile_read_utm(src, cell, 64, indexes=[1, 2, 3],
+                                         dst_crs=src.crs, block_cache=cache)
+            uncached = utils.tile_read_utm(src, cell, 64, indexes=[1, 2, 3],
+                                           dst_crs=src.crs)
+            assert np.array_equal(cached[0], uncached[0])
+            assert np.array_equal(cached[1], uncached[1])
+    assert cache.hits > cache.misses > 0
+    assert 0 < cache.nbytes <= cache.max_bytes
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
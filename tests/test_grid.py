@@ -0,0 +1,79 @@
+"""tests cw_tiler.grid"""
+
+import pytest
+from cw_tiler import main
+from cw_tiler.grid import AnalysisGrid
+import numpy as np
+
+
+utm_bounds = (658029.4, 4006947.2, 661540.7, 4010003.9)
+stride_size_meters = 300
+cell_size_meters = 400
+
+
+def test_column_order_matches_calculate_cell_array():
+    cells, groups = main.calculate_cell_array(utm_bounds, stride_size_meters=stride_size_meters,
+                                              cell_size_meters=cell_size_meters, quad_space=True)
+    grid = AnalysisGrid(utm_bounds, stride_size_meters=stride_size_meters,
+                        cell_size_meters=cell_size_meters, quad_space=True)
+    assert len(grid) == len(cells)
+    chunks = list(grid.chunks(chunksize=7, return_groups=True))
+    assert np.array_equal(np.vstack([c for c, _ in chunks]), cells)
+    assert np.array_equal(np.concatenate([g for _, g in chunks]), groups)
+    assert np.array_equal(grid[5], cells[5])
+    assert np.array_equal(grid[-1], cells[-1])
+    with pytest.raises(IndexError):
+        grid[len(grid)]
+
+
+@pytest.mark.parametrize('order', ['row', 'block', 'hilbert'])
+def test_orders_are_permutations_with_random_access(order):
+    cells, _ = main.calculate_cell_array(utm_bounds, stride_size_meters=stride_size_meters,
+                                         cell_size_meters=cell_size_meters)
+    grid = AnalysisGrid(utm_bounds, stride_size_meters=stride_size_meters,
+                        cell_size_meters=cell_size_meters, order=order,
+                        block_shape=(3, 2))
+    ordered = np.vstack(list(grid.chunks(chunksize=5)))
+    assert sorted(map(tuple, ordered.tolist())) == sorted(map(tuple, cells.tolist()))
+    for index in [0, 3, len(grid) // 2, len(grid) - 1]:
+        assert np.array_equal(grid[index], ordered[index])
+
+
+def test_hilbert_order_steps_to_neighbours():
+    grid = AnalysisGrid((0, 0, 1700, 1700), stride_size_meters=100,
+                        cell_size_meters=100, order='hilbert')
+    assert len(grid) == 256
+    cells = np.vstack(list(grid.chunks()))
+    steps = np.abs(np.diff(cells[:, :2], axis=0)).sum(axis=1)
+    assert np.all(steps == 100)
+
+
+def _tiled_raster(path):
+    import rasterio
+    from rasterio.transform import from_origin
+    with rasterio.open(path, 'w', driver='GTiff', width=1024, height=1024,
+                       count=1, dtype='uint8', crs='EPSG:32613',
+                       transform=from_origin(500000, 4000000, 1, 1),
+                       tiled=True, blockxsize=64, blockysize=64) as dst:
+        dst.write(np.zeros((1, 1024, 1024), dtype='uint8'))
+    return str(path)
+
+
+def test_block_ranges_and_ordering(tmp_path):
+    import rasterio
+    from cw_tiler import grid
+    with rasterio.open(_tiled_raster(tmp_path / 'tiled.tif')) as src:
+        cells, groups = main.calculate_cell_array(src.bounds, stride_size_meters=96,
+                                                  cell_size_meters=128, quad_space=True)
+        ranges = grid.block_ranges(cells, src)
+        # the first cell sits on the southern edge of the image.
+        assert ranges[0].tolist() == [0, 14, 1, 15]
+
+        order = grid.order_cells_by_block(cells, src)
+        shuffled = np.random.RandomState(0).permutation(len(cells))
+        planned = grid.estimate_blocks_decoded(cells, src, order=order, cache_bytes=40 * 64 * 64)
+        random = grid.estimate_blocks_decoded(cells, src, order=shuffled, cache_bytes=40 * 64 * 64)
+        assert planned.mean() < random.mean()
+
+        grouped = grid.order_cells_by_block(cells, src, groups=groups)
+        assert np.all(np.diff(groups[grouped]) >= 0)
@@ -1,5 +1,6 @@
 """tests rio_tiler.base"""
 
+import math
 import os
 import pytest
 ## Note, for mac osx compatability import something from shapely.geometry before importing fiona or geopandas
@@ -11,6 +12,7 @@ from cw_tiler import main
 from cw_tiler import utils
 from cw_tiler import vector_utils
 import numpy as np
+from rio_tiler.errors import TileOutsideBounds
 
 
 utmX, utmY = 658029, 4006947
@@ -211,16 +213,333 @@ def test_return_tile_full():
             dst.write(tile)
 
 
+def test_tile_utm_batch_matches_tile_utm():
 
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        utm_bounds = utils.get_utm_bounds(src, utm_crs)
+        cells_list_dict = main.calculate_analysis_grid(utm_bounds, stride_size_meters=10, cell_size_meters=20)
 
+        batch = list(main.tile_utm_batch(src, cells_list_dict, tilesize=64, dst_crs=utm_crs))
+        assert len(batch) == len(cells_list_dict[0])
+        for cell, (tile, mask, window, window_transform) in zip(cells_list_dict[0], batch):
+            single = main.tile_utm(src, *cell, tilesize=64, dst_crs=utm_crs)
+            assert np.array_equal(tile, single[0])
+            assert np.array_equal(mask, single[1])
+            assert window_transform == single[3]
 
 
+def test_tile_utm_batch_outside_bounds():
 
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        cells = [[0, 0, 20, 20]]
+        with pytest.raises(TileOutsideBounds):
+            main.tile_utm(src, *cells[0], tilesize=64, dst_crs=utm_crs)
+        with pytest.raises(TileOutsideBounds):
+            next(main.tile_utm_batch(src, np.array(cells), tilesize=64, dst_crs=utm_crs))
+        with pytest.raises(TileOutsideBounds):
+            next(main.tile_utm_strips(src, np.array(cells), tilesize=64, dst_crs=utm_crs))
 
 
+def test_tile_utm_rejects_missing_source():
 
+    missing = os.path.join(os.path.dirname(ADDRESS), 'missing.tif')
+    with pytest.raises(ValueError):
+        main.tile_utm(missing, 0, 0, 20, 20)
+    with pytest.raises(ValueError):
+        next(main.tile_utm_batch(missing, [[0, 0, 20, 20]]))
+    with pytest.raises(ValueError):
+        next(main.tile_utm_strips(missing, [[0, 0, 20, 20]]))
 
 
+def test_tile_utm_strips_matches_tile_utm():
 
-
-
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        utm_bounds = utils.get_utm_bounds(src, utm_crs)
+        cells_list_dict = main.calculate_analysis_grid(utm_bounds, stride_size_meters=7.5, cell_size_meters=10)
+        cells = main.cells_to_array(cells_list_dict)
+
+        strips = list(main.tile_utm_strips(src, cells_list_dict, tilesize=64, dst_crs=utm_crs))
+        assert sorted(i for i, _ in strips) == list(range(len(cells)))
+        for i, (tile, mask, window, window_transform) in strips:
+            single = main.tile_utm(src, *cells[i], tilesize=64, dst_crs=utm_crs)
+            assert np.array_equal(tile, single[0])
+            assert np.array_equal(mask, single[1])
+            assert window_transform.almost_equals(single[3])
+
+
+def test_tile_read_utm_uses_overviews(tmp_path):
+
+    # overviews filled with a sentinel value, and a copy without overviews
+    path = str(tmp_path / 'overviews.tif')
+    plain = str(tmp_path / 'plain.tif')
+    with rasterio.open(ADDRESS) as src:
+        profile = dict(src.profile, driver='GTiff')
+        data = src.read()
+    for dst_path in (path, plain):
+        with rasterio.open(dst_path, 'w', **profile) as dst:
+            dst.write(data)
+    with rasterio.open(path, 'r+') as dst:
+        dst.build_overviews([2, 4], rasterio.enums.Resampling.average)
+    for level in (0, 1):
+        with rasterio.open(path, 'r+', overview_level=level) as dst:
+            dst.write(np.full((dst.count, dst.height, dst.width), 7, dtype=dst.dtypes[0]))
+
+    with rasterio.open(path) as src, rasterio.open(plain) as ref:
+        info = utils.SourceInfo(src)
+        bounds = src.bounds
+        assert utils.get_overview_level(info, bounds, src.width, dst_crs=src.crs) is None
+        assert utils.get_overview_level(info, bounds, src.height // 2, dst_crs=src.crs) == 0
+        assert utils.get_overview_level(info, bounds, src.height // 5, dst_crs=src.crs) == 1
+
+        for dst_crs in (src.crs, info.utm_crs):
+            tile_bounds = info.bounds_in(dst_crs)
+            expected = utils.tile_read_utm(ref, tile_bounds, 64, indexes=[1, 2, 3], dst_crs=dst_crs)
+            for source in (path, src, info):
+                # by default, GDAL reads downsampled tiles from an overview
+                default = utils.tile_read_utm(source, tile_bounds, 64, indexes=[1, 2, 3], dst_crs=dst_crs)
+                assert np.all(default[0] == 7)
+                # native resolution on request, whatever the source type
+                native = utils.tile_read_utm(source, tile_bounds, 64, indexes=[1, 2, 3], dst_crs=dst_crs,
+                                             native=True)
+                assert np.array_equal(native[0], expected[0])
+                assert np.array_equal(native[1], expected[1])
+                assert native[2] == expected[2]
+
+            coarse = utils.tile_read_utm(info, tile_bounds, 64, indexes=[1, 2, 3], dst_crs=dst_crs,
+                                         overviews=True)
+            assert np.all(coarse[0] == 7)
+            # the window is relative to the 2x overview
+            assert coarse[2].width < expected[2].width / 1.5
+            # open datasets are never reopened for overviews
+            reader = utils.tile_read_utm(src, tile_bounds, 64, indexes=[1, 2, 3], dst_crs=dst_crs,
+                                         overviews=True)
+            assert np.array_equal(reader[0], default[0])
+            with pytest.raises(ValueError):
+                utils.tile_read_utm(info, tile_bounds, 64, dst_crs=dst_crs, overviews=True, native=True)
+        info.close()
+
+
+def test_native_copies_only_when_requested(tmp_path, monkeypatch):
+
+    path = str(tmp_path / 'overviews.tif')
+    with rasterio.open(ADDRESS) as src:
+        profile = dict(src.profile, driver='GTiff')
+        data = src.read()
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data)
+    with rasterio.open(path, 'r+') as dst:
+        dst.build_overviews([2, 4], rasterio.enums.Resampling.average)
+
+    copies = []
+    native_copy = utils._native_copy
+
+    def counting_copy(*args, **kwargs):
+        copies.append(args)
+        return native_copy(*args, **kwargs)
+    monkeypatch.setattr(utils, '_native_copy', counting_copy)
+
+    info = utils.SourceInfo(path)
+    ll_x, ll_y, ur_x, ur_y = info.utm_bounds
+    gsd = (ur_x - ll_x) / 64
+    # the default reads never copy, for paths or open datasets
+    with rasterio.open(path) as src:
+        for source in (path, src):
+            expected = utils.tile_read_utm(source, info.utm_bounds, 64, indexes=[1, 2, 3], dst_crs=info.utm_crs)
+            tile = main.tile_utm(source, *info.utm_bounds, indexes=[1, 2, 3], tilesize=64, dst_crs=info.utm_crs)
+            assert np.array_equal(tile[0], expected[0])
+            main.tile_utm(source, *info.bounds, indexes=[1, 2, 3], tilesize=64, dst_crs=info.crs)
+    assert copies == []
+
+    # native reads from paths use a handle without overviews rather than a copy
+    expected = utils.tile_read_utm(path, info.utm_bounds, 64, indexes=[1, 2, 3], dst_crs=info.utm_crs,
+                                   native=True)
+    tile = main.tile_utm(path, *info.utm_bounds, indexes=[1, 2, 3], tilesize=64, dst_crs=info.utm_crs,
+                         native=True)
+    chip = main.get_chip(path, ll_x, ll_y, gsd, utm_crs=info.utm_crs, indexes=[1, 2, 3], tilesize=64,
+                         native=True)
+    batch = list(main.tile_utm_batch(path, [info.utm_bounds], indexes=[1, 2, 3], tilesize=64,
+                                     dst_crs=info.utm_crs, native=True))
+    assert copies == []
+    assert np.array_equal(tile[0], expected[0])
+    assert np.array_equal(batch[0][0], expected[0])
+    assert chip[0].shape == (3, 64, 64)
+
+    # open datasets cannot be reopened without overviews, so they are copied
+    with rasterio.open(path) as src:
+        reader = main.tile_utm(src, *info.utm_bounds, indexes=[1, 2, 3], tilesize=64, dst_crs=info.utm_crs,
+                               native=True)
+    assert len(copies) == 1
+    assert np.array_equal(reader[0], expected[0])
+    info.close()
+
+
+def test_tile_read_utm_mask_options():
+
+    with rasterio.open(ADDRESS_ALPHA) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        bounds = utils.get_utm_bounds(src, utm_crs)
+        data, mask, _, _ = utils.tile_read_utm(src, bounds, 64, indexes=[1, 2, 3], alpha=4, dst_crs=utm_crs)
+        alpha = utils.tile_read_utm(src, bounds, 64, indexes=[4], dst_crs=utm_crs)[0][0]
+        assert data.shape == (3, 64, 64)
+        assert np.array_equal(mask, alpha)
+
+        skipped = utils.tile_read_utm(src, bounds, 64, indexes=[1, 2, 3], dst_crs=utm_crs, mask=False)
+        assert skipped[1] is None
+        assert np.array_equal(skipped[0], data)
+
+        nearest = utils.tile_read_utm(src, bounds, 64, indexes=[1, 2, 3], dst_crs=utm_crs, mask='nearest')
+        assert set(np.unique(nearest[1])) <= {0, 255}
+
+
+def test_calculate_cell_array_matches_grid():
+
+    utm_bounds = (658029.4, 4006947.2, 661540.7, 4010003.9)
+    for quad_space in (False, True):
+        cells_list_dict = main.calculate_analysis_grid(utm_bounds, stride_size_meters=stride_size_meters,
+                                                       cell_size_meters=cell_size_meters, quad_space=quad_space)
+        cells, groups = main.calculate_cell_array(utm_bounds, stride_size_meters=stride_size_meters,
+                                                  cell_size_meters=cell_size_meters, quad_space=quad_space)
+        assert cells.shape == (sum(len(v) for v in cells_list_dict.values()), 4)
+        assert cells.dtype == np.float64
+        assert np.all(cells[:, 2] < utm_bounds[2]) and np.all(cells[:, 3] < utm_bounds[3])
+        for key, cell_list in cells_list_dict.items():
+            assert cells[groups == key].tolist() == cell_list
+    assert set(groups) == {0, 1, 2, 3}
+
+
+def test_calculate_anchor_points_dtype():
+
+    utm_bounds = (658029.4, 4006947.2, 661540.7, 4010003.9)
+    for stride, dtype in ((400, np.int64), (7.5, np.float64)):
+        anchors = main.calculate_anchor_points(utm_bounds, stride_size_meters=stride, quad_space=True)
+        xs = np.arange(math.ceil(utm_bounds[0]), math.floor(utm_bounds[2]), stride)
+        ys = np.arange(math.ceil(utm_bounds[1]), math.floor(utm_bounds[3]), stride)
+        expected = {0: [], 1: [], 2: [], 3: []}
+        for i, x in enumerate(xs):
+            for j, y in enumerate(ys):
+                expected[2 * (i % 2) + j % 2].append([x, y])
+        assert anchors == expected
+        assert all(type(value) is dtype for points in anchors.values() for point in points for value in point)
+
+
+def test_source_info_matches_dataset():
+
+    with rasterio.open(ADDRESS) as src:
+        info = utils.SourceInfo(src)
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        assert info.utm_crs == utm_crs
+        assert utils.get_wgs84_bounds(info) == utils.get_wgs84_bounds(src)
+        assert utils.get_utm_bounds(info, utm_crs) == utils.get_utm_bounds(src, utm_crs)
+        assert info.block_shape == src.block_shapes[0]
+
+        ll_x, ll_y = info.utm_bounds[0] + 5, info.utm_bounds[1] + 5
+        from_info = main.get_chip(info, ll_x, ll_y, 0.3, tilesize=64)
+        from_src = main.get_chip(src, ll_x, ll_y, 0.3, tilesize=64)
+        assert np.array_equal(from_info[0], from_src[0])
+        assert from_info[3] == from_src[3]
+
+
+def test_tile_read_utm_no_warp_matches_warp():
+
+    with rasterio.open(ADDRESS) as src:
+        b = src.bounds
+        bounds = (b.left + 5, b.bottom + 5, b.left + 25, b.bottom + 25)
+        fast = utils.tile_read_utm(src, bounds, 100, indexes=[1, 2, 3], dst_crs=src.crs)
+        warped = utils.tile_read_utm(src, bounds, 100, indexes=[1, 2, 3], dst_crs=src.crs,
+                                     force_warp=True)
+    assert utils.crs_equivalent(src.crs, 'EPSG:26913')
+    assert np.array_equal(fast[0], warped[0])
+    assert np.array_equal(fast[1], warped[1])
+    assert fast[3] == warped[3]
+
+
+def test_tile_read_utm_no_warp_matches_warp_with_nodata():
+
+    with rasterio.open(ADDRESS_NODATA) as src:
+        b = src.bounds
+        width, height = b.right - b.left, b.top - b.bottom
+        t = src.transform
+        assert (src.read_masks(1) == 0).any()
+        for bounds, tilesize in (((b.left + width / 2, b.bottom + height / 2,
+                                   b.right + width / 4, b.top + height / 4), 300),
+                                 (tuple(b), 300),
+                                 ((b.left + 10 * t.a, b.top - 110 * abs(t.e),
+                                   b.left + 110 * t.a, b.top - 10 * abs(t.e)), 100)):
+            fast = utils.tile_read_utm(src, bounds, tilesize, indexes=[1, 2, 3], dst_crs=src.crs)
+            warped = utils.tile_read_utm(src, bounds, tilesize, indexes=[1, 2, 3], dst_crs=src.crs,
+                                         force_warp=True)
+            assert np.array_equal(fast[0], warped[0])
+            assert np.array_equal(fast[1], warped[1])
+
+
+def test_snapped_grid_reads_whole_pixel_windows():
+
+    with rasterio.open(ADDRESS) as src:
+        cells_list_dict = main.calculate_analysis_grid(src.bounds, stride_size_meters=5, cell_size_meters=10,
+                                                       snapToGrid=True, src_transform=src.transform)
+        width, height = main.snapped_cell_pixels(10, src.transform)
+        assert (width, height) == (67, 67)
+        for cell in cells_list_dict[0][:5]:
+            assert cell[2] < src.bounds.right and cell[3] < src.bounds.top
+            tile, mask, window, window_transform = utils.tile_read_utm(src, cell, width, indexes=[1, 2, 3],
+                                                                       dst_crs=src.crs)
+            assert (window.width, window.height) == (width, height)
+            assert np.array_equal(tile, src.read([1, 2, 3], window=window))
+    # without a transform, the grid is not snapped
+    with pytest.warns(UserWarning):
+        unsnapped = main.calculate_analysis_grid(src.bounds, snapToGrid=True)
+    assert unsnapped == main.calculate_analysis_grid(src.bounds)
+
+
+def test_tile_utm_out_buffers():
+
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        utm_bounds = utils.get_utm_bounds(src, utm_crs)
+        cells = main.cells_to_array(main.calculate_analysis_grid(utm_bounds, stride_size_meters=10,
+                                                                 cell_size_meters=20))
+        expected = main.tile_utm(src, *cells[0], tilesize=64, dst_crs=utm_crs)
+
+        out = np.zeros((2, 3, 64, 64), dtype=np.uint8)
+        out_mask = np.zeros((2, 64, 64), dtype=np.uint8)
+        data, mask, _, _ = main.tile_utm(src, *cells[0], tilesize=64, dst_crs=utm_crs,
+                                         out=out[1], out_mask=out_mask[1])
+        assert np.shares_memory(data, out) and np.shares_memory(mask, out_mask)
+        assert np.array_equal(out[1], expected[0])
+        assert np.array_equal(out_mask[1], expected[1])
+
+        batch = list(main.tile_utm_batch(src, cells[:2], tilesize=64, dst_crs=utm_crs,
+                                         out=out, out_mask=out_mask))
+        assert np.array_equal(out[0], expected[0])
+        assert np.shares_memory(batch[1][0], out[1])
+
+        with pytest.raises(ValueError):
+            main.tile_utm(src, *cells[0], tilesize=32, dst_crs=utm_crs, out=out[0])
+
+        # other integer dtypes get the same values, float ones are not rounded
+        wide = np.zeros((3, 64, 64), dtype=np.int32)
+        main.tile_utm(src, *cells[0], tilesize=64, dst_crs=utm_crs, out=wide)
+        assert np.array_equal(wide, expected[0])
+        unrounded = np.zeros((3, 64, 64), dtype=np.float32)
+        main.tile_utm(src, *cells[0], tilesize=64, dst_crs=utm_crs, out=unrounded)
+        assert np.abs(unrounded - expected[0]).max() <= 0.5
+        assert not np.array_equal(unrounded, expected[0])
+
+
+def test_tile_read_utm_out_with_alpha():
+
+    with rasterio.open(ADDRESS_ALPHA) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        bounds = utils.get_utm_bounds(src, utm_crs)
+        expected = utils.tile_read_utm(src, bounds, 64, indexes=[1, 2, 3], alpha=4, dst_crs=utm_crs)
+
+        out = np.zeros((3, 64, 64), dtype=np.uint8)
+        data, mask, _, _ = utils.tile_read_utm(src, bounds, 64, indexes=[1, 2, 3], alpha=4, dst_crs=utm_crs,
+                                               out=out)
+        assert np.shares_memory(data, out)
+        assert mask.shape == (64, 64)
+        assert np.array_equal(data, expected[0])
+        assert np.array_equal(mask, expected[1])
@@ -0,0 +1,103 @@
+"""tests cw_tiler.parallel"""
+
+import os
+import pytest
+from shapely import geometry
+import rasterio
+from rio_tiler.errors import TileOutsideBounds
+from cw_tiler import main
+from cw_tiler import parallel
+from cw_tiler import utils
+import numpy as np
+
+
+PREFIX = os.path.join(os.path.dirname(__file__), 'fixtures')
+ADDRESS = '{}/my-bucket/hro_sources/colorado/201404_13SED190110_201404_0x1500m_CL_1.tif'.format(PREFIX)
+
+
+def _grid():
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        utm_bounds = utils.get_utm_bounds(src, utm_crs)
+    cells = main.calculate_analysis_grid(utm_bounds, stride_size_meters=5,
+                                         cell_size_meters=10)
+    return utm_crs, main.cells_to_array(cells)
+
+
+def test_tile_utm_parallel_matches_batch():
+    utm_crs, cells = _grid()
+    with rasterio.open(ADDRESS) as src:
+        expected = list(main.tile_utm_batch(src, cells, tilesize=32,
+                                            dst_crs=utm_crs))
+    results = list(parallel.tile_utm_parallel(ADDRESS, cells, n_workers=2,
+                                              chunksize=3, tilesize=32,
+                                              dst_crs=utm_crs))
+    assert len(results) == len(expected)
+    for result, single in zip(results, expected):
+        assert np.array_equal(result[0], single[0])
+        assert np.array_equal(result[1], single[1])
+        assert result[3] == single[3]
+
+
+def test_tile_utm_parallel_outside_bounds():
+    utm_crs, cells = _grid()
+    cells = np.vstack([cells[:2], [[0, 0, 10, 10]], cells[2:4]])
+    results = list(parallel.tile_utm_parallel(ADDRESS, cells, n_workers=2,
+                                              chunksize=2, tilesize=32,
+                                              dst_crs=utm_crs,
+                                              return_exceptions=True))
+    assert len(results) == 5
+    assert isinstance(results[2], TileOutsideBounds)
+    assert results[3][0].shape == (3, 32, 32)
+    with pytest.raises(TileOutsideBounds):
+        list(parallel.tile_utm_parallel(ADDRESS, cells, n_workers=2,
+                                        chunksize=2, tilesize=32,
+                                        dst_crs=utm_crs))
+
+
+def test_tile_utm_parallel_bounds_pending_chunks(monkeypatch):
+    utm_crs, cells = _grid()
+    pulled = []
+    chunks = parallel._chunks
+
+    def counting_chunks(cell_array, chunksize):
+        for chunk in chunks(cell_array, chunksize):
+            pulled.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(parallel, '_chunks', counting_chunks)
+    for tile_utm in (parallel.tile_utm_parallel, parallel.tile_utm_threaded):
+        del pulled[:]
+        tiles = tile_utm(ADDRESS, cells, n_workers=2, chunksize=1, tilesize=8, dst_crs=utm_crs)
+        # a slow consumer: no more than 2 * n_workers chunks are submitted
+        # ahead of the tiles it has taken
+        for taken, tile in enumerate(tiles, 1):
+            assert len(pulled) <= taken + 4
+        assert taken == len(cells) == len(pulled)
+
+
+def test_worker_handles_closed():
+    parallel._init_worker(ADDRESS, {})
+    info = parallel._worker_state['src']
+    overview = info.overview(1) if info.overviews else None
+    parallel._close_worker()
+    assert info.src.closed
+    assert overview is None or overview.closed
+    assert 'src' not in parallel._worker_state
+
+
+def test_tile_utm_threaded_matches_batch():
+    utm_crs, cells = _grid()
+    with rasterio.open(ADDRESS) as src:
+        expected = list(main.tile_utm_batch(src, cells, tilesize=32,
+                                            dst_crs=utm_crs))
+    cells = np.vstack([cells, [[0, 0, 10, 10]]])
+    results = list(parallel.tile_utm_threaded(ADDRESS, cells, n_workers=3,
+                                              chunksize=2, tilesize=32,
+                                              dst_crs=utm_crs,
+                                              return_exceptions=True))
+    assert len(results) == len(expected) + 1
+    assert isinstance(results[-1], TileOutsideBounds)
+    for result, single in zip(results, expected):
+        assert np.array_equal(result[0], single[0])
+        assert np.array_equal(result[1], single[1])
@@ -0,0 +1,38 @@
+"""tests cw_tiler.store"""
+
+import os
+import rasterio
+from cw_tiler import main
+from cw_tiler import utils
+from cw_tiler.store import ChipStore, tile_to_store
+import numpy as np
+
+
+PREFIX = os.path.join(os.path.dirname(__file__), 'fixtures')
+ADDRESS = '{}/my-bucket/hro_sources/colorado/201404_13SED190110_201404_0x1500m_CL_1.tif'.format(PREFIX)
+
+
+def test_tile_to_store_round_trip(tmp_path):
+    path = str(tmp_path / 'chips')
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        utm_bounds = utils.get_utm_bounds(src, utm_crs)
+        cells = main.cells_to_array(main.calculate_analysis_grid(
+            utm_bounds, stride_size_meters=10, cell_size_meters=20))
+        cells = np.vstack([cells, [[0, 0, 20, 20]]])
+        store = tile_to_store(src, cells, path, tilesize=32, dst_crs=utm_crs)
+        store.close()
+        expected = list(main.tile_utm_batch(src, cells[:-1], tilesize=32, dst_crs=utm_crs))
+
+    with ChipStore(path) as store:
+        assert len(store) == len(cells)
+        assert store.data.shape == (len(cells), 3, 32, 32)
+        assert store.crs == rasterio.crs.CRS.from_string(utm_crs)
+        assert store.index['valid'].tolist() == [True] * len(expected) + [False]
+        for i, (data, mask, window, window_transform) in enumerate(expected):
+            assert np.array_equal(store[i][0], data)
+            assert np.array_equal(store[i][1], mask)
+            assert store.transform(i) == window_transform
+            assert store.window(i) == window
+            assert store.bounds(i) == tuple(cells[i])
+        assert not store.data.flags.writeable
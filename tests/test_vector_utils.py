@@ -0,0 +1,278 @@
+"""tests cw_tiler.vector_utils"""
+
+import os
+import pytest
+from shapely import geometry
+import geopandas as gpd
+import pandas as pd
+from cw_tiler import main
+from cw_tiler import vector_utils
+import numpy as np
+
+
+def _buildings(n=400, seed=0):
+    rng = np.random.RandomState(seed)
+    x = rng.uniform(0, 1000, n)
+    y = rng.uniform(0, 1000, n)
+    size = rng.uniform(2, 30, n)
+    return gpd.GeoDataFrame(
+        {'id': np.arange(n)},
+        geometry=[geometry.box(xi, yi, xi + s, yi + s) for xi, yi, s in zip(x, y, size)],
+        crs='EPSG:32613')
+
+
+def test_join_cells_to_features_matches_search():
+    gdf = _buildings()
+    cells = main.cells_to_array(main.calculate_analysis_grid((0, 0, 1000, 1000), stride_size_meters=150,
+                                                             cell_size_meters=200))
+    indptr, indices = vector_utils.join_cells_to_features(gdf, cells)
+    assert indptr.shape == (len(cells) + 1,) and indptr[-1] == len(indices)
+    for i, cell in enumerate(cells):
+        expected = vector_utils.search_gdf_polygon(gdf, geometry.box(*cell))
+        assert sorted(expected['id']) == indices[indptr[i]:indptr[i + 1]].tolist()
+
+        joined = vector_utils.vector_tile_utm(gdf, cell, feature_indices=indices[indptr[i]:indptr[i + 1]])
+        searched = vector_utils.vector_tile_utm(gdf, cell)
+        assert sorted(joined['id']) == sorted(searched['id'])
+
+
+def test_clip_gdf_inside_and_crossing():
+    gdf = gpd.GeoDataFrame({'id': [0, 1, 2]},
+                           geometry=[geometry.box(10, 10, 20, 20),
+                                     geometry.box(90, 10, 110, 20),
+                                     geometry.box(200, 200, 210, 210)])
+    tile = geometry.box(0, 0, 100, 100)
+    for kwargs in ({}, {'feature_indices': [0, 1]}):
+        clipped = vector_utils.clip_gdf(gdf.copy(), tile, **kwargs)
+        assert clipped['id'].tolist() == [0, 1]
+        assert list(clipped.columns) == ['id', 'geometry', 'origarea', 'origlen', 'partialDec', 'truncated']
+        assert clipped['partialDec'].tolist() == [1.0, 0.5]
+        assert clipped['truncated'].tolist() == [0, 1]
+        assert clipped.geometry.iloc[0].equals(gdf.geometry.iloc[0])
+        assert clipped.geometry.iloc[1].equals(geometry.box(90, 10, 100, 20))
+
+    # precomputed measures are reused rather than recomputed per tile
+    measured = vector_utils.add_orig_measures(gdf.copy())
+    measured['origarea'] = 400.0
+    clipped = vector_utils.clip_gdf(measured, tile, feature_indices=[0, 1])
+    assert clipped['partialDec'].tolist() == [0.25, 0.25]
+
+
+def test_clip_gdf_lines():
+    gdf = gpd.GeoDataFrame({'id': [0, 1]},
+                           geometry=[geometry.LineString([(10, 10), (20, 10)]),
+                                     geometry.LineString([(90, 10), (110, 10)])])
+    measured = vector_utils.add_orig_measures(gdf.copy())
+    assert measured['origlen'].tolist() == [10.0, 20.0]
+    assert measured['origarea'].tolist() == [0.0, 0.0]
+    polygons = vector_utils.add_orig_measures(_buildings(n=5))
+    assert (polygons['origarea'] > 0).all() and (polygons['origlen'] == 0).all()
+
+    tile = geometry.box(0, 0, 100, 100)
+    for kwargs in ({}, {'feature_indices': [0, 1]}):
+        # lines are not measured by default, so short fragments are kept
+        clipped = vector_utils.clip_gdf(gdf.copy(), tile, min_partial_perc=0.6, geom_type='LineString',
+                                        **kwargs)
+        assert clipped['origlen'].tolist() == [10.0, 20.0]
+        assert clipped['partialDec'].tolist() == [1.0, 1.0]
+        assert clipped['truncated'].tolist() == [0, 0]
+
+        clipped = vector_utils.clip_gdf(gdf.copy(), tile, geom_type='LineString', line_partial=True, **kwargs)
+        assert clipped['origlen'].tolist() == [10.0, 20.0]
+        assert clipped['partialDec'].tolist() == [1.0, 0.5]
+        assert clipped['truncated'].tolist() == [0, 1]
+        clipped = vector_utils.clip_gdf(gdf.copy(), tile, min_partial_perc=0.6, geom_type='LineString',
+                                        line_partial=True, **kwargs)
+        assert clipped['id'].tolist() == [0]
+
+
+def test_label_raster_matches_rasterize_gdf(tmp_path):
+    from rasterio import transform
+    gdf = _buildings()
+    cells = main.cells_to_array(main.calculate_analysis_grid((0.5, 0.5, 1000, 1000), stride_size_meters=150,
+                                                             cell_size_meters=200))
+    path = str(tmp_path / 'labels.npy')
+    labels = vector_utils.LabelRaster.from_gdf(gdf, cells, 64, path=path)
+    assert labels.labels.max() == 1
+    reopened = vector_utils.LabelRaster.open(path)
+    for cell in cells:
+        expected = vector_utils.rasterize_gdf(gdf, (64, 64), src_transform=transform.from_bounds(*cell, 64, 64))
+        chip = reopened.chip(cell, 64)
+        assert np.shares_memory(chip, reopened.labels)
+        assert np.array_equal(chip, expected)
+
+    # chips off the lattice are sampled at their pixel centers
+    cell = cells[0] + 1.0
+    expected = vector_utils.rasterize_gdf(gdf, (64, 64), src_transform=transform.from_bounds(*cell, 64, 64))
+    assert (labels.chip(cell, 64) != expected).mean() < 0.05
+
+
+def test_rasterize_labels_channels():
+    from rasterio import features, transform
+    gdf = _buildings(n=300)
+    gdf['cls'] = gdf['id'] % 3 + 1
+    tfm = transform.from_bounds(0, 0, 1000, 1000, 256, 256)
+    labels = vector_utils.rasterize_labels(gdf, (256, 256), channels=['mask', 'class', 'instance', 'boundary'],
+                                           class_column='cls', src_transform=tfm)
+    assert labels.shape == (4, 256, 256) and labels.dtype == np.uint16
+    assert np.array_equal(labels[0], vector_utils.rasterize_gdf(gdf, (256, 256), src_transform=tfm))
+    classes = features.rasterize(zip(gdf.geometry, gdf['cls']), out_shape=(256, 256), transform=tfm)
+    assert np.array_equal(labels[1], classes)
+    instances = features.rasterize(zip(gdf.geometry, range(1, len(gdf) + 1)), out_shape=(256, 256),
+                                   transform=tfm, dtype=np.uint16)
+    assert np.array_equal(labels[2], instances)
+    assert labels[3].sum() > 0 and np.all(labels[0][labels[3] == 1] == 1)
+
+    out = np.zeros((2, 256, 256), dtype=np.uint32)
+    result = vector_utils.rasterize_labels(gdf, (256, 256), channels=['class', 'instance'], class_column='cls',
+                                           id_column='id', src_transform=tfm, out=out)
+    assert result is out
+    assert vector_utils.rasterize_labels(gdf, (8, 8), channels=['class'], class_column='cls').dtype == np.uint8
+
+    # float outputs get the same values
+    out = np.zeros((4, 256, 256), dtype=np.float32)
+    result = vector_utils.rasterize_labels(gdf, (256, 256), channels=['mask', 'class', 'instance', 'boundary'],
+                                           class_column='cls', src_transform=tfm, out=out)
+    assert result is out
+    assert np.array_equal(out, labels)
+
+    # label values must fit in the output and be non-negative integers
+    with pytest.raises(ValueError):
+        vector_utils.rasterize_labels(gdf, (8, 8), channels=['instance'], dtype=np.uint8)
+    with pytest.raises(ValueError):
+        vector_utils.rasterize_labels(gdf, (8, 8), channels=['instance'], out=np.zeros((1, 8, 8), np.uint8))
+    for bad in (np.nan, 1.5, -1):
+        gdf['bad'] = gdf['cls'].astype(float)
+        gdf.loc[0, 'bad'] = bad
+        with pytest.raises(ValueError):
+            vector_utils.rasterize_labels(gdf, (8, 8), channels=['class'], class_column='bad')
+    gdf['bad'] = gdf['cls'].astype(float)
+    assert vector_utils.rasterize_labels(gdf, (8, 8), channels=['class'], class_column='bad').dtype == np.uint8
+
+
+def test_read_vector_file_aoi(tmp_path):
+    import rasterio
+    from cw_tiler import utils
+    address = os.path.join(os.path.dirname(__file__), 'fixtures', 'my-bucket', 'hro_sources', 'colorado',
+                           '201404_13SED190110_201404_0x1500m_CL_1.tif')
+    with rasterio.open(address) as src:
+        bounds = src.bounds
+        crs = src.crs
+    # a grid of 10 m squares in the raster CRS around its footprint
+    xs = np.arange(bounds.left - 200, bounds.right + 200, 10.0)
+    ys = np.arange(bounds.bottom - 200, bounds.top + 200, 10.0)
+    gdf = gpd.GeoDataFrame({'id': np.arange(len(xs) * len(ys))},
+                           geometry=[geometry.box(x, y, x + 5, y + 5) for x in xs for y in ys], crs=crs)
+    path = str(tmp_path / 'buildings.gpkg')
+    gdf.to_file(path, driver='GPKG')
+
+    wgs84_bounds = utils.get_wgs84_bounds(address)
+    expected = gdf.to_crs('EPSG:4326').cx[wgs84_bounds[0]:wgs84_bounds[2], wgs84_bounds[1]:wgs84_bounds[3]]
+    aoi = vector_utils.read_vector_file_aoi(path, address)
+    assert 0 < len(aoi) < len(gdf)
+    assert set(expected['id']) <= set(aoi['id'])
+    assert aoi.crs == gdf.crs
+    chunks = list(vector_utils.read_vector_file_chunks(path, bbox=wgs84_bounds, chunksize=7))
+    assert max(len(chunk) for chunk in chunks) <= 7
+    assert [i for chunk in chunks for i in chunk['id']] == aoi['id'].tolist()
+    assert sorted(vector_utils.read_vector_file(path, bbox=wgs84_bounds)['id']) == sorted(aoi['id'])
+
+
+def test_read_vector_file_utm_cache(tmp_path, monkeypatch):
+    gdf = _buildings(n=50).to_crs('EPSG:4326')
+    path = str(tmp_path / 'buildings.gpkg')
+    gdf.to_file(path, driver='GPKG')
+    cache_dir = str(tmp_path / 'cache')
+
+    cold = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+    assert 'origarea' in cold.columns and 'origlen' in cold.columns
+
+    # a warm load does not reproject
+    def fail(*args, **kwargs):
+        raise AssertionError('reprojected a cached file')
+    monkeypatch.setattr(vector_utils, 'transformToUTM', fail)
+    warm = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir=cache_dir)
+    assert warm.equals(cold)
+    assert warm.crs == cold.crs
+    assert list(warm.columns) == list(cold.columns)
+
+
+def test_transform_to_utm_chunked_matches_to_crs():
+    gdf = _buildings(n=100)
+    # a mix of 2D and 3D geometries
+    centroids = gdf.geometry.centroid[::7]
+    gdf.loc[::7, 'geometry'] = gpd.points_from_xy(centroids.x, centroids.y, np.arange(len(centroids)))
+    gdf = gdf.to_crs('EPSG:4326')
+    expected = gdf.to_crs('EPSG:32613')
+    result = vector_utils.transformToUTM(gdf, 'EPSG:32613', n_workers=3, chunksize=37)
+    assert result.crs == expected.crs
+    assert result.equals(expected)
+    assert result.geometry.has_z.equals(expected.geometry.has_z)
+
+
+def test_read_vector_file_utm_cache_lines(tmp_path):
+    gdf = gpd.GeoDataFrame({'id': [0, 1]},
+                           geometry=[geometry.LineString([(10, 10), (20, 10)]),
+                                     geometry.box(0, 0, 10, 10)],
+                           crs='EPSG:32613').to_crs('EPSG:4326')
+    path = str(tmp_path / 'lines.gpkg')
+    gdf.to_file(path, driver='GPKG')
+    cache_dir = str(tmp_path / 'cache')
+    for _ in range(2):
+        cached = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir=cache_dir)
+        assert np.allclose(cached['origlen'], [10.0, 0.0])
+        assert np.allclose(cached['origarea'], [0.0, 100.0])
+
+
+def test_read_vector_file_utm_cache_cells(tmp_path, monkeypatch):
+    gdf = _buildings(n=100)
+    gdf['name'] = ['b{}'.format(i) if i % 3 else None for i in gdf['id']]
+    gdf = gdf.to_crs('EPSG:4326')
+    path = str(tmp_path / 'buildings.gpkg')
+    gdf.to_file(path, driver='GPKG')
+    cache_dir = str(tmp_path / 'cache')
+    cells = main.cells_to_array(main.calculate_analysis_grid((0, 0, 1000, 1000), stride_size_meters=200,
+                                                             cell_size_meters=200))
+
+    cold, indptr, indices = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir=cache_dir, cells=cells)
+    expected = vector_utils.join_cells_to_features(cold, cells)
+    assert np.array_equal(indptr, expected[0]) and np.array_equal(indices, expected[1])
+
+    # a warm load neither reprojects nor builds a spatial index
+    def fail(*args, **kwargs):
+        raise AssertionError('recomputed a cached result')
+    monkeypatch.setattr(vector_utils, 'transformToUTM', fail)
+    monkeypatch.setattr(vector_utils, 'join_cells_to_features', fail)
+    warm, warm_indptr, warm_indices = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir=cache_dir,
+                                                                        cells=cells)
+    assert warm.equals(cold)
+    assert warm['name'].tolist() == cold['name'].tolist()
+    assert np.array_equal(warm_indptr, indptr) and np.array_equal(warm_indices, indices)
+
+
+def test_read_vector_file_utm_cache_in_cwd(tmp_path, monkeypatch):
+    gdf = _buildings(n=20).to_crs('EPSG:4326')
+    gdf['name'] = ['b{}'.format(i) for i in gdf['id']]
+    path = str(tmp_path / 'buildings.gpkg')
+    gdf.to_file(path, driver='GPKG')
+    monkeypatch.chdir(tmp_path)
+    cold = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir='')
+    assert len(os.listdir(str(tmp_path))) == 3
+    warm = vector_utils.read_vector_file_utm(path, 'EPSG:32613', cache_dir='')
+    assert warm.equals(cold)
+
+
+def test_cached_gdf_keeps_index(tmp_path):
+    gdf = _buildings(n=10)
+    gdf['seen'] = pd.date_range('2020-01-01', periods=10, tz='US/Mountain')
+    cache_path = str(tmp_path / 'entry')
+    for index in [pd.RangeIndex(5, 25, 2, name='fid'),
+                  pd.Index(['b{}'.format(i) for i in range(10)], name='key'),
+                  pd.Index(np.arange(10)[::-1] * 3)]:
+        gdf.index = index
+        assert vector_utils._save_cached_gdf(gdf, cache_path)
+        cached = vector_utils._load_cached_gdf(cache_path)
+        assert cached.equals(gdf)
+        assert cached.index.equals(gdf.index) and cached.index.name == gdf.index.name
+        assert cached['seen'].dtype == gdf['seen'].dtype
@@ -0,0 +1,65 @@
+"""tests cw_tiler.writer"""
+
+import os
+import pytest
+import rasterio
+from cw_tiler import main
+from cw_tiler import utils
+from cw_tiler.writer import ChipWriter
+import numpy as np
+
+
+PREFIX = os.path.join(os.path.dirname(__file__), 'fixtures')
+ADDRESS = '{}/my-bucket/hro_sources/colorado/201404_13SED190110_201404_0x1500m_CL_1.tif'.format(PREFIX)
+
+
+def _chips():
+    with rasterio.open(ADDRESS) as src:
+        utm_crs = utils.calculate_UTM_crs(utils.get_wgs84_bounds(src))
+        utm_bounds = utils.get_utm_bounds(src, utm_crs)
+        cells = main.calculate_analysis_grid(utm_bounds, stride_size_meters=10,
+                                             cell_size_meters=20)
+        chips = list(main.tile_utm_batch(src, cells, tilesize=32, dst_crs=utm_crs))
+    return utm_crs, chips
+
+
+def test_chip_writer_formats(tmp_path):
+    utm_crs, chips = _chips()
+    with ChipWriter(n_workers=2, max_pending=2) as writer:
+        for i, (data, mask, window, window_transform) in enumerate(chips):
+            writer.submit(str(tmp_path / '{}.tif'.format(i)), data, mask,
+                          window_transform, utm_crs)
+        data, mask, window, window_transform = chips[0]
+        writer.submit(str(tmp_path / 'chip.png'), data, mask)
+        writer.submit(str(tmp_path / 'chip.npy'), data)
+        writer.submit(str(tmp_path / 'chip16.png'), data.astype(np.uint16) * 257, mask)
+    assert writer.written == len(chips) + 3
+
+    for i, (data, mask, window, window_transform) in enumerate(chips):
+        with rasterio.open(str(tmp_path / '{}.tif'.format(i))) as chip:
+            assert np.array_equal(chip.read(), data)
+            assert np.array_equal(chip.read_masks(1), mask)
+            assert chip.transform == window_transform
+            assert chip.crs == rasterio.crs.CRS.from_string(utm_crs)
+    with rasterio.open(str(tmp_path / 'chip.png')) as chip:
+        assert np.array_equal(chip.read(4), chips[0][1])
+    assert np.array_equal(np.load(str(tmp_path / 'chip.npy')), chips[0][0])
+    with rasterio.open(str(tmp_path / 'chip16.png')) as chip:
+        assert chip.dtypes[3] == 'uint16'
+        assert np.array_equal(chip.read(4), chips[0][1].astype(np.uint16) * 257)
+
+
+def test_chip_writer_errors(tmp_path):
+    data = np.zeros((1, 8, 8), dtype=np.uint8)
+    writer = ChipWriter()
+    with pytest.raises(ValueError):
+        writer.submit(str(tmp_path / 'chip.jpg'), data)
+    for i in range(20):
+        writer.submit(str(tmp_path / 'missing' / '{}.tif'.format(i)), data)
+    writer.submit(str(tmp_path / 'chip.tif'), data)
+    with pytest.raises(rasterio.errors.RasterioIOError):
+        writer.flush()
+    # completed chips are not kept, and the error is only raised once
+    assert not writer._pending
+    writer.close()
+    assert writer.written == 1